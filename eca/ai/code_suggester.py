@@ -1,7 +1,12 @@
 # eca/ai/code_suggester.py
 
+import builtins
+import keyword
 import re
 
+from .completion_index import CompletionIndex
+from .typo_index import python_vocabulary
+
 TEMPLATES = {
     "for": [
         "for i in range():",
@@ -23,37 +28,96 @@ TEMPLATES = {
     ]
 }
 
+WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*$")
+NAMES = re.compile(r"\b[A-Za-z_][A-Za-z0-9_]{2,}")
+
+
 class CodeSuggester:
-    def __init__(self, max_suggestions=5):
+    """
+    Completions for the cursor line from a CompletionIndex holding the
+    templates, Python keywords and builtins, and identifiers harvested from
+    the buffer. Accepted suggestions rank higher next time.
+    """
+    def __init__(self, max_suggestions=5, max_lines=20000):
         self.max_suggestions = max_suggestions
+        self.max_lines = max_lines
+        self.index = CompletionIndex(keep=max(8, max_suggestions))
+        self._seen_lines = set()
+        for templates in TEMPLATES.values():
+            for t in templates:
+                self.index.seed(t, 2.0)
+        # keywords before builtins before stdlib modules; shorter names first within each
+        keywords = set(keyword.kwlist) | set(getattr(keyword, "softkwlist", ()))
+        names = {n for n in dir(builtins) if not n.startswith("_")}
+        for words, weight in ((keywords, 1.2), (names, 1.0), (python_vocabulary(), 0.5)):
+            for word in sorted(words, key=lambda w: (len(w), w)):
+                self.index.seed(word, weight)
 
     def _get_token(self, text):
-        lines = text.rstrip().split("\n")
-        if not lines:
-            return ""
-
-        last_line = lines[-1].strip().lower()
-
-        # 🔥 VERY IMPORTANT FALLBACK LOGIC
-        if last_line.startswith("for"):
-            return "for"
-        if last_line.startswith("if"):
-            return "if"
-        if last_line.startswith("while"):
-            return "while"
-        if last_line.startswith("def"):
-            return "def"
-        if last_line.startswith("print"):
-            return "print"
-
-        # normal word detection
-        words = re.findall(r"[a-zA-Z_]+", last_line)
+        words = WORD.findall(text)
         return words[-1] if words else ""
 
-    def suggest(self, editor_text):
-        token = self._get_token(editor_text)
+    def suggest(self, line):
+        """
+        Suggestions for `line`, the text before the cursor on its line (a
+        longer text is reduced to its last line).
+        """
+        line = line.rstrip("\n").rsplit("\n", 1)[-1]
+        stmt = line.lstrip()
+        if not stmt:
+            return []
+        out = []
+        # whole statement, then templates for the statement's keyword
+        # (`for x in` -> for templates), then the word being typed
+        candidates = [stmt]
+        head = stmt.split()[0]
+        if head in TEMPLATES:
+            candidates.append(head + " " if " " in TEMPLATES[head][0] else head)
+        token = self._get_token(stmt)
+        # a finished keyword is not a prefix: `in` must not offer int/input
+        if not keyword.iskeyword(token):
+            candidates.append(token)
+        for prefix in candidates:
+            if not prefix:
+                continue
+            for s in self.index.complete(prefix, self.max_suggestions):
+                if s not in out:
+                    out.append(s)
+            if len(out) >= self.max_suggestions:
+                break
+        return out[:self.max_suggestions]
+
+    def edit(self, line, suggestion):
+        """
+        How to apply `suggestion` to `line`, the text before the cursor: as
+        (n, text), replace the last n characters with text. A statement
+        template only fills in from the word being typed, so what the user
+        already wrote (`for x in ra` -> `for x in range():`) is kept.
+        """
+        stmt = line.lstrip()
+        token = self._get_token(line)
+        if stmt and suggestion.startswith(stmt):
+            return len(stmt), suggestion
+        words = stmt.split()
+        parts = suggestion.split(" ")
+        if words and len(parts) > 1 and parts[0] == words[0]:
+            start = len(words) - 1 if token and not line[-1].isspace() else len(words)
+            return len(token) if start < len(words) else 0, " ".join(parts[start:])
+        return len(token), suggestion
 
-        if token in TEMPLATES:
-            return TEMPLATES[token][:self.max_suggestions]
+    def accept(self, suggestion):
+        self.index.touch(suggestion, 3.0)
 
-        return []
\ No newline at end of file
+    def learn(self, text, skip_line=None):
+        """
+        Harvest identifiers from lines of `text` not seen before. `skip_line`
+        (0-based) is the line being edited, whose words are still partial.
+        """
+        if len(self._seen_lines) > self.max_lines:
+            self._seen_lines.clear()
+        for idx, line in enumerate(text.split("\n")):
+            if idx == skip_line or line in self._seen_lines:
+                continue
+            self._seen_lines.add(line)
+            for name in NAMES.findall(line):
+                self.index.touch(name)
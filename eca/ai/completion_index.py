@@ -0,0 +1,88 @@
+# eca/ai/completion_index.py
+
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.top = []
+
+
+class CompletionIndex:
+    """
+    Prefix trie of completions ranked by frequency and recency.
+    Every use adds a weight that grows geometrically with each event
+    (forward decay), so one score orders entries by how often and how lately
+    they were used. Scores only ever increase, which lets every node keep its
+    `keep` best completions precomputed: a lookup walks the prefix and
+    returns that list, however many entries the trie holds.
+    """
+    def __init__(self, keep=8, growth=1.02):
+        self.keep = keep
+        self.growth = growth
+        self.scores = {}
+        self._boost = 1.0
+        self._root = _Node()
+
+    def __contains__(self, text):
+        return text in self.scores
+
+    def __len__(self):
+        return len(self.scores)
+
+    def touch(self, text, weight=1.0):
+        """Record one use of `text` (adding it if new)."""
+        if not text:
+            return
+        score = self.scores.get(text, 0.0) + weight * self._boost
+        self._boost *= self.growth
+        self._set(text, score)
+        if self._boost > 1e100:
+            self._rescale()
+
+    def seed(self, text, weight=1.0):
+        """
+        Add `text` with base score `weight` without counting a use: the
+        decay clock does not advance, so seeds rank by weight alone and, on
+        equal weight, in the order they were added. Known texts are kept.
+        """
+        if not text or text in self.scores:
+            return
+        self._set(text, weight * self._boost)
+
+    def _set(self, text, score):
+        self.scores[text] = score
+        node = self._root
+        self._rank(node, text, score)
+        for ch in text:
+            node = node.children.setdefault(ch, _Node())
+            self._rank(node, text, score)
+
+    def _rank(self, node, text, score):
+        top = node.top
+        if text in top:
+            top.remove(text)
+        elif len(top) >= self.keep and score <= self.scores[top[-1]]:
+            return
+        i = len(top)
+        while i and self.scores[top[i - 1]] < score:
+            i -= 1
+        top.insert(i, text)
+        del top[self.keep:]
+
+    def _rescale(self):
+        # uniform scaling keeps every node's ordering valid
+        scale = self._boost
+        for k in self.scores:
+            self.scores[k] /= scale
+        self._boost = 1.0
+
+    def complete(self, prefix, n=5):
+        """Best completions of `prefix`, excluding `prefix` itself."""
+        node = self._root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        return [t for t in node.top if t != prefix][:n]
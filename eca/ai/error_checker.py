@@ -1,7 +1,12 @@
 # eca/ai/error_checker.py
 
 import ast
-import difflib
+import re
+import threading
+import time
+
+from ..instrument import perf
+from .typo_index import TypoIndex, python_vocabulary
 
 COMMON_MISTAKES = {
     "rnage": "range",
@@ -9,45 +14,227 @@ COMMON_MISTAKES = {
     "fucntion": "function",
 }
 
+IDENTIFIER = re.compile(r"(?<![\w.])[A-Za-z_][A-Za-z0-9_]*")
+# strings and comments are not code; blanked out before tokenizing
+_LITERALS = re.compile(r"#.*|'(?:\\.|[^'\\])*'?|\"(?:\\.|[^\"\\])*\"?")
+# names a line introduces: def/class, imports, assignment and loop targets, parameters
+_DEFINITIONS = [
+    re.compile(r"^\s*(?:async\s+)?(?:def|class)\s+(\w+)"),
+    re.compile(r"\b(?:import|as)\s+(\w+)"),
+    re.compile(r"^\s*from\s+\S+\s+import\s+(.*)"),
+    re.compile(r"^\s*([\w\s,]+?)\s*(?:[-+*/%|&^]|//|\*\*)?=(?!=)"),
+    re.compile(r"^\s*(\w+)\s*:(?!=)\s*\S"),  # annotated name
+    re.compile(r"\bfor\s+([\w\s,]+?)\s+in\b"),
+    re.compile(r"^\s*(?:async\s+)?def\s+\w+\s*\((.*?)\)?\s*(?:->.*)?:?\s*$"),
+    re.compile(r"\blambda\s+([\w\s,*]*):"),
+    re.compile(r"\b(?:global|nonlocal)\s+([\w\s,]+)"),
+]
+# several names per line: keyword arguments and defaults, walrus targets
+_DEFINITIONS_ALL = [
+    re.compile(r"[(,]\s*(\w+)\s*(?::[^,=()]*)?=(?!=)"),
+    re.compile(r"(\w+)\s*:="),
+]
+
 class ErrorChecker:
     """
     AI-assisted error detection with fix hints.
+    Typos are looked up in a TypoIndex over Python keywords, builtins and
+    stdlib module names, extended with the names the buffer defines.
+    A missing or extra letter is only reported for words of at least
+    `indel_min_length` characters: shorter real names are often one letter
+    off a keyword (width/with, state/stat), as are plurals (tokens/token).
     """
+    def __init__(self, min_length=4, indel_min_length=7):
+        self.min_length = min_length
+        self.indel_min_length = indel_min_length
+        self.vocabulary = python_vocabulary() | set(COMMON_MISTAKES.values())
+        self.index = TypoIndex(self.vocabulary)
+        self.names = set()  # names learned from the buffer, on top of the vocabulary
 
-    def check_errors(self, code_text):
-        errors = []
+    @perf.timed("check_errors")
+    def check_errors(self, code_text, skip_line=None):
+        """`skip_line` (0-based) is the line being typed; it defines no names yet."""
+        lines = code_text.split("\n")
+        self.set_names(name for idx, line in enumerate(lines) if idx != skip_line
+                       for name in self.definitions(line))
+        errors = self.check_syntax(code_text)
+        for idx, line in enumerate(lines):
+            errors.extend(self.check_line(idx + 1, line))
+        return errors
 
+    def check_syntax(self, code_text):
         # 1️⃣ Syntax errors (AST based)
         try:
             ast.parse(code_text)
         except SyntaxError as e:
-            errors.append({
+            return [{
                 "line": e.lineno,
                 "message": e.msg,
                 "hint": "Check syntax near this line"
-            })
+            }]
+        return []
+
+    def definitions(self, line):
+        """Names `line` defines."""
+        code = _LITERALS.sub("", line)
+        groups = []
+        for pattern in _DEFINITIONS:
+            m = pattern.search(code)
+            if m:
+                groups.append(m.group(1))
+        for pattern in _DEFINITIONS_ALL:
+            groups.extend(pattern.findall(code))
+        return {name for group in groups for name in IDENTIFIER.findall(group)
+                if name not in COMMON_MISTAKES}
 
+    def learn_line(self, line):
+        """Add the names `line` defines to the vocabulary; True if any were new."""
+        added = False
+        for name in self.definitions(line) - self.vocabulary:
+            self.names.add(name)
+            if self.index.add(name):
+                added = True
+        return added
+
+    def set_names(self, names):
+        """
+        Make `names` the learned names: new ones are added and names no
+        longer defined anywhere are forgotten. True if anything changed.
+        """
+        names = set(names) - self.vocabulary
+        gone, new = self.names - names, names - self.names
+        for name in gone:
+            self.index.remove(name)
+        for name in new:
+            self.index.add(name)
+        self.names = names
+        return bool(gone or new)
+
+    def check_line(self, lineno, line):
         # 2️⃣ Common typo detection
-        lines = code_text.split("\n")
+        errors = []
+        for w in IDENTIFIER.findall(_LITERALS.sub("", line)):
+            if w in COMMON_MISTAKES:
+                errors.append({
+                    "line": lineno,
+                    "message": f"Possible typo: '{w}'",
+                    "hint": f"Did you mean '{COMMON_MISTAKES[w]}'?"
+                })
+                continue
+            if len(w) < self.min_length or w in self.index:
+                continue
+
+            # short names only get one edit, or nearly every name would match something
+            match = self.index.lookup(w, 1 if len(w) < 8 else 2)
+            if match and len(match[0]) != len(w) and (
+                    len(w) < self.indel_min_length or w.startswith(match[0])):
+                continue
+            if match:
+                errors.append({
+                    "line": lineno,
+                    "message": f"Suspicious word: '{w}'",
+                    "hint": f"Did you mean '{match[0]}'?"
+                })
+        return errors
+
+
+class ErrorCheckService:
+    """
+    Runs ErrorChecker off the Tk thread.
+    submit() is cheap and may be called on every keystroke: checks start only
+    after `delay` seconds without new edits, a newer submit cancels a run in
+    progress, and per-line typo results are cached by line content so only
+    edited lines are re-scanned. The cache is dropped whenever the names
+    the buffer defines change; the line being typed defines none, so a name
+    is learned once the caret leaves its line, and forgotten when its
+    definition is deleted. The UI collects results with poll().
+    """
+    def __init__(self, checker=None, delay=0.3, cache_size=5000):
+        self.checker = checker or ErrorChecker()
+        self.delay = delay
+        self.cache_size = cache_size
+        self._line_cache = {}
+        self._cache_version = self.checker.index.version
+        self._definitions = {}  # line -> names it defines
+        self._syntax_cache = (None, [])
+        self._gen = 0
+        self._pending = None  # (gen, text, skip_line)
+        self._deadline = 0.0
+        self._result = None  # (gen, errors)
+        self._delivered = 0
+        self._running = True
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def submit(self, text, skip_line=None):
+        """Check `text`; `skip_line` (0-based) is the line being typed."""
+        with self._cond:
+            self._gen += 1
+            self._pending = (self._gen, text, skip_line)
+            self._deadline = time.monotonic() + self.delay
+            self._cond.notify()
+
+    def poll(self):
+        """Errors of the newest finished check not yet returned, else None."""
+        with self._cond:
+            if self._result is None or self._result[0] <= self._delivered:
+                return None
+            self._delivered = self._result[0]
+            return self._result[1]
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._running and (self._pending is None or time.monotonic() < self._deadline):
+                    self._cond.wait(None if self._pending is None else max(0.0, self._deadline - time.monotonic()))
+                if not self._running:
+                    return
+                gen, text, skip_line = self._pending
+                self._pending = None
+            with perf.stage("check_errors.background"):
+                errors = self._check(gen, text, skip_line)
+            if errors is None:
+                perf.count("check_errors.cancelled")
+                continue
+            with self._cond:
+                self._result = (gen, errors)
+
+    def _stale(self, gen):
+        return gen != self._gen
+
+    def _check(self, gen, text, skip_line=None):
+        if self._syntax_cache[0] != text:
+            self._syntax_cache = (text, self.checker.check_syntax(text))
+        errors = list(self._syntax_cache[1])
+        lines = text.split("\n")
+        if len(self._definitions) > self.cache_size:
+            self._definitions.clear()
+        names = set()
+        for idx, line in enumerate(lines):
+            if idx == skip_line:
+                continue
+            defined = self._definitions.get(line)
+            if defined is None:
+                defined = self._definitions[line] = self.checker.definitions(line)
+            names |= defined
+        self.checker.set_names(names)
+        if len(self._line_cache) > self.cache_size or self._cache_version != self.checker.index.version:
+            # a newly defined name may clear earlier "suspicious word" hits
+            self._line_cache.clear()
+            self._cache_version = self.checker.index.version
         for idx, line in enumerate(lines):
-            words = line.split()
-            for w in words:
-                if w in COMMON_MISTAKES:
-                    errors.append({
-                        "line": idx + 1,
-                        "message": f"Possible typo: '{w}'",
-                        "hint": f"Did you mean '{COMMON_MISTAKES[w]}'?"
-                    })
-
-                # fuzzy match for keywords
-                matches = difflib.get_close_matches(
-                    w, COMMON_MISTAKES.values(), n=1, cutoff=0.85
-                )
-                if matches and w not in COMMON_MISTAKES.values():
-                    errors.append({
-                        "line": idx + 1,
-                        "message": f"Suspicious word: '{w}'",
-                        "hint": f"Did you mean '{matches[0]}'?"
-                    })
-
-        return errors
\ No newline at end of file
+            if idx % 64 == 0 and self._stale(gen):
+                return None
+            hits = self._line_cache.get(line)
+            if hits is None:
+                # cache without the line number so a moved line stays a hit
+                hits = [(e["message"], e["hint"]) for e in self.checker.check_line(0, line)]
+                self._line_cache[line] = hits
+            errors.extend({"line": idx + 1, "message": m, "hint": h} for m, h in hits)
+        return errors
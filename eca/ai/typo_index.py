@@ -0,0 +1,122 @@
+# eca/ai/typo_index.py
+
+import builtins
+import keyword
+import sys
+
+
+def _deletes(word, max_distance):
+    """Strings reachable from `word` by removing up to max_distance characters, mapped to how many."""
+    out = {word: 0}
+    frontier = [word]
+    for n in range(1, max_distance + 1):
+        nxt = []
+        for w in frontier:
+            if len(w) <= 1:
+                continue
+            for i in range(len(w)):
+                d = w[:i] + w[i + 1:]
+                if d not in out:
+                    out[d] = n
+                    nxt.append(d)
+        frontier = nxt
+    return out
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (adjacent swaps cost 1); limit+1 if above limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+            row_min = min(row_min, v)
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class TypoIndex:
+    """
+    Symmetric-delete spelling index (as in SymSpell).
+    Every word is stored under each string obtained by deleting up to
+    `max_distance` characters from its first `prefix_length` characters; a
+    query generates its own deletes and verifies only the words sharing one,
+    so lookups do not scan the vocabulary. Words can be added and removed
+    at any time; `version` changes whenever the vocabulary does.
+    """
+    def __init__(self, words=(), max_distance=2, prefix_length=7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.words = set()
+        self.version = 0
+        self._deletes = {}
+        self.update(words)
+
+    def __contains__(self, word):
+        return word in self.words
+
+    def __len__(self):
+        return len(self.words)
+
+    def add(self, word):
+        if not word or word in self.words:
+            return False
+        self.words.add(word)
+        for d, n in _deletes(word[:self.prefix_length], self.max_distance).items():
+            self._deletes.setdefault(d, []).append((word, n))
+        self.version += 1
+        return True
+
+    def remove(self, word):
+        if word not in self.words:
+            return False
+        self.words.discard(word)
+        for d in _deletes(word[:self.prefix_length], self.max_distance):
+            entries = [e for e in self._deletes.get(d, ()) if e[0] != word]
+            if entries:
+                self._deletes[d] = entries
+            else:
+                self._deletes.pop(d, None)
+        self.version += 1
+        return True
+
+    def update(self, words):
+        for w in words:
+            self.add(w)
+
+    def lookup(self, token, max_distance=None):
+        """Closest known word within max_distance as (word, distance), or None."""
+        limit = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        if token in self.words:
+            return token, 0
+        best = None
+        seen = set()
+        for d in _deletes(token[:self.prefix_length], limit):
+            for word, m in self._deletes.get(d, ()):
+                # a shared delete needs at most `limit` removals on either side
+                if m > limit or word in seen:
+                    continue
+                seen.add(word)
+                dist = edit_distance(token, word, limit)
+                if dist <= limit and (best is None or (dist, word) < best[::-1]):
+                    best = (word, dist)
+        return best
+
+
+def python_vocabulary():
+    """Keywords, public builtins and stdlib module names."""
+    words = set(keyword.kwlist) | set(getattr(keyword, "softkwlist", ()))
+    words |= {n for n in dir(builtins) if not n.startswith("_")}
+    words |= set(getattr(sys, "stdlib_module_names", sys.builtin_module_names))
+    words |= {"self", "cls", "args", "kwargs", "main", "__name__", "__init__", "__main__"}
+    return words
@@ -4,16 +4,29 @@ from .voice_engine import VoiceEngine
 from .settings import Settings
 from .logger import Logger
 from .command_engine import CommandEngine
+from .instrument import perf
 from .ui_manager import UIManager
 
 class ECAApp:
     def __init__(self):
         self.settings = Settings()
-        self.logger = Logger()
+        perf.enabled = bool(self.settings.get("instrumentation"))
+        self.logger = Logger(settings=self.settings)
         self.gaze = GazeTracker(self.settings, self.logger)
-        self.voice = VoiceEngine(self.settings, self.logger)
-        self.command_engine = CommandEngine(self.logger)
+        self.command_engine = CommandEngine(
+            self.logger, self.settings.get("grammar_path"),
+            threshold=float(self.settings.get("command_threshold") or 0.8),
+            word_threshold=float(self.settings.get("command_word_threshold") or 0.95),
+        )
+        # command phrases restrict the offline recognizer's vocabulary in command mode
+        self.voice = VoiceEngine(self.settings, self.logger, phrases=self.command_engine.phrases)
         self.ui = UIManager(self.settings, self.gaze, self.voice, self.command_engine, self.logger)
 
     def run(self):
-        self.ui.start()
+        try:
+            self.ui.start()
+        finally:
+            self.gaze.stop()
+            self.logger.close()
+            if perf.enabled:
+                perf.dump(self.settings.get("instrumentation_dump"))
@@ -0,0 +1,180 @@
+"""
+Headless replay and benchmark for the gaze pipeline.
+
+Feeds recorded video, a directory of images or synthetic frames through
+GazeTracker.process() (the same detection, smoothing and logging path as
+the live tracker) without a camera or a Tk window, and reports per-frame
+latency percentiles, sustained FPS and CPU time.
+
+    python -m eca.bench --synthetic 300
+    python -m eca.bench --video session.mp4 --detector both --realtime
+    python -m eca.bench --images frames/ --json result.json
+"""
+import argparse, glob, json, os, sys, tempfile, time
+import cv2
+import numpy as np
+
+from .gaze_tracker import GazeTracker, MP_AVAILABLE
+from .logger import Logger
+from .settings import DEFAULTS
+
+
+class VideoSource:
+    """Frames of a video file with their recorded timestamps."""
+    def __init__(self, path):
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self._n = 0
+
+    def __iter__(self):
+        while True:
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            ts = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 or self._n / self.fps
+            self._n += 1
+            yield frame, ts
+        self.cap.release()
+
+
+class ImageDirSource:
+    """Images of a directory in name order, spaced at `fps`."""
+    PATTERNS = ("*.png", "*.jpg", "*.jpeg", "*.bmp")
+
+    def __init__(self, path, fps=30.0):
+        self.paths = sorted(p for pat in self.PATTERNS for p in glob.glob(os.path.join(path, pat)))
+        self.fps = fps
+
+    def __iter__(self):
+        for i, p in enumerate(self.paths):
+            frame = cv2.imread(p)
+            if frame is not None:
+                yield frame, i / self.fps
+
+
+class SyntheticSource:
+    """A bright blob drifting over a noisy background, `count` frames at `fps`."""
+    def __init__(self, count=300, size=(640, 480), fps=30.0, seed=0):
+        self.count = count
+        self.size = size
+        self.fps = fps
+        self.rng = np.random.default_rng(seed)
+
+    def __iter__(self):
+        w, h = self.size
+        base = self.rng.integers(0, 60, (h, w, 3), dtype=np.uint8)
+        for i in range(self.count):
+            frame = base.copy()
+            t = i / self.fps
+            cx = int(w / 2 + w / 4 * np.sin(t))
+            cy = int(h / 2 + h / 6 * np.cos(0.7 * t))
+            cv2.ellipse(frame, (cx, cy), (w // 8, h // 5), 0, 0, 360, (170, 190, 220), -1)
+            yield frame, t
+
+
+class _Settings:
+    def __init__(self, overrides):
+        self._data = dict(overrides)
+
+    def get(self, key):
+        return self._data.get(key, DEFAULTS.get(key))
+
+
+def run(source, detector="mediapipe", realtime=False, limit=None, log_dir=None, settings=None):
+    """Replay `source` through a fresh GazeTracker; returns a stats dict."""
+    log_dir = log_dir or tempfile.mkdtemp(prefix="eca_bench_")
+    logger = Logger(path=os.path.join(log_dir, f"bench_{detector}.jsonl"),
+                    gaze_path=os.path.join(log_dir, f"bench_{detector}.bin"))
+    tracker = GazeTracker(_Settings(settings or {}), logger)
+    tracker.use_mediapipe = detector == "mediapipe"
+    tracker.init_detectors()
+
+    latencies = []
+    detected = 0
+    t0 = time.perf_counter()
+    cpu0 = time.process_time()
+    first_ts = None
+    for n, (frame, ts) in enumerate(source):
+        if limit is not None and n >= limit:
+            break
+        if realtime:
+            first_ts = ts if first_ts is None else first_ts
+            delay = (ts - first_ts) - (time.perf_counter() - t0)
+            if delay > 0:
+                time.sleep(delay)
+        start = time.perf_counter()
+        sample = tracker.process(frame, ts)
+        logger.log_gaze(sample)
+        latencies.append(time.perf_counter() - start)
+        detected += sample["conf"] > 0
+    wall = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+    logger.close()
+
+    lat = np.array(latencies) * 1000.0 if latencies else np.zeros(1)
+    frames = len(latencies)
+    return {
+        "detector": detector,
+        "frames": frames,
+        "detected": int(detected),
+        "wall_s": wall,
+        "fps": frames / wall if wall > 0 else 0.0,
+        "cpu_s": cpu,
+        "cpu_ms_per_frame": cpu * 1000.0 / max(1, frames),
+        "latency_ms": {
+            "p50": float(np.percentile(lat, 50)),
+            "p90": float(np.percentile(lat, 90)),
+            "p99": float(np.percentile(lat, 99)),
+            "max": float(lat.max()),
+        },
+        "log_dir": log_dir,
+    }
+
+
+def _format(stats):
+    lat = stats["latency_ms"]
+    return (f"{stats['detector']:>9}: {stats['frames']} frames ({stats['detected']} with face) "
+            f"{stats['fps']:.1f} FPS | latency p50 {lat['p50']:.2f} p90 {lat['p90']:.2f} "
+            f"p99 {lat['p99']:.2f} max {lat['max']:.2f} ms | CPU {stats['cpu_ms_per_frame']:.2f} ms/frame")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m eca.bench", description=__doc__.strip().split("\n")[0])
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--video", help="recorded video file")
+    src.add_argument("--images", help="directory of frames")
+    src.add_argument("--synthetic", type=int, metavar="N", help="N synthetic frames (default 300)")
+    ap.add_argument("--detector", choices=("mediapipe", "haar", "both"), default="both")
+    ap.add_argument("--realtime", action="store_true", help="pace frames at their recorded timing")
+    ap.add_argument("--limit", type=int, help="stop after this many frames")
+    ap.add_argument("--fps", type=float, default=30.0, help="frame rate for image/synthetic sources")
+    ap.add_argument("--log-dir", help="where to write the replay logs (default: a temp dir)")
+    ap.add_argument("--json", help="also write the results to this file")
+    ap.add_argument("--roi", action="store_true", help="run FaceMesh on face crops (roi_tracking)")
+    args = ap.parse_args(argv)
+
+    def make_source():
+        if args.video:
+            return VideoSource(args.video)
+        if args.images:
+            return ImageDirSource(args.images, fps=args.fps)
+        return SyntheticSource(args.synthetic or 300, fps=args.fps)
+
+    detectors = ["mediapipe", "haar"] if args.detector == "both" else [args.detector]
+    if "mediapipe" in detectors and not MP_AVAILABLE:
+        print("mediapipe is not installed; skipping the MediaPipe path")
+        detectors.remove("mediapipe")
+    results = []
+    for det in detectors:
+        stats = run(make_source(), det, realtime=args.realtime, limit=args.limit, log_dir=args.log_dir,
+                    settings={"roi_tracking": args.roi})
+        print(_format(stats))
+        results.append(stats)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0 if results else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
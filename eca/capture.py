@@ -0,0 +1,163 @@
+import threading, time
+import numpy as np
+
+# capture modes from best quality to cheapest
+RESOLUTION_LADDER = [(1280, 720), (960, 540), (640, 480), (480, 360), (320, 240)]
+
+
+class ResolutionPolicy:
+    """
+    Picks the capture resolution from measured tracker throughput.
+    Steps down one rung when the processed frame rate stays below
+    `low * target_fps`, and back up only after a longer run above
+    `high * target_fps`, so the mode does not oscillate. When the camera
+    reports a lower frame rate than `target_fps` (`camera_fps`), that is
+    the rate the tracker is measured against.
+    """
+    def __init__(self, width=640, height=480, target_fps=30, enabled=False,
+                 window=2.0, low=0.75, high=0.95, down_windows=2, up_windows=5):
+        self.target_fps = float(target_fps)
+        self.camera_fps = None
+        self.enabled = enabled
+        self.window = window
+        self.low = low
+        self.high = high
+        self.down_windows = down_windows
+        self.up_windows = up_windows
+        self.ladder = sorted(set(RESOLUTION_LADDER) | {(width, height)}, key=lambda m: -m[0] * m[1])
+        # never step up past the configured resolution
+        self.top = self.ladder.index((width, height))
+        self.index = self.top
+        self._window_start = None
+        self._frames = 0
+        self._slow = 0
+        self._fast = 0
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            width=int(settings.get("capture_width") or 640),
+            height=int(settings.get("capture_height") or 480),
+            target_fps=float(settings.get("capture_fps") or 30),
+            enabled=bool(settings.get("adaptive_resolution")),
+        )
+
+    @property
+    def mode(self):
+        return self.ladder[self.index]
+
+    @property
+    def expected_fps(self):
+        """Best rate the tracker can see: the target, capped by the camera."""
+        if self.camera_fps and self.camera_fps > 0:
+            return min(self.target_fps, self.camera_fps)
+        return self.target_fps
+
+    def tick(self, now=None):
+        """Count one processed frame; returns the new (w, h) when the mode should change."""
+        if not self.enabled:
+            return None
+        now = time.time() if now is None else now
+        if self._window_start is None:
+            self._window_start = now
+        self._frames += 1
+        elapsed = now - self._window_start
+        if elapsed < self.window:
+            return None
+        rate = self._frames / elapsed
+        self._window_start = now
+        self._frames = 0
+        expected = self.expected_fps
+        if rate < self.low * expected:
+            self._slow += 1
+            self._fast = 0
+        elif rate >= self.high * expected:
+            self._fast += 1
+            self._slow = 0
+        else:
+            self._slow = self._fast = 0
+        if self._slow >= self.down_windows and self.index < len(self.ladder) - 1:
+            self.index += 1
+        elif self._fast >= self.up_windows and self.index > self.top:
+            self.index -= 1
+        else:
+            return None
+        self._slow = self._fast = 0
+        return self.mode
+
+
+class PooledFrame:
+    """A pool buffer plus its reference count; see FramePool for the rules."""
+    __slots__ = ("data", "refs", "pool")
+
+    def __init__(self, data, pool):
+        self.data = data
+        self.refs = 0
+        self.pool = pool
+
+    def retain(self):
+        self.pool._retain(self)
+        return self
+
+    def release(self):
+        self.pool._release(self)
+
+
+class FramePool:
+    """
+    Small set of preallocated frame buffers shared by the capture producer
+    and its consumers, so the 30 FPS frame path does not churn the allocator.
+
+    Ownership rules:
+      - acquire() hands out a free buffer holding one reference, owned by
+        the caller (the capture stage), who fills it with cap.read(image=...).
+      - Passing a frame on (mailbox, publishing as the tracker's current
+        frame) transfers that reference; whoever discards it releases it.
+      - Readers that use a published frame outside the tracker lock must
+        retain() it under the lock and release() it when done.
+      - A buffer goes back to the free list only when its count reaches
+        zero. Buffers of an old shape (after a resolution change) are simply
+        dropped.
+    """
+    def __init__(self, shape, count=6, dtype="uint8"):
+        self.count = count
+        self.dtype = dtype
+        self.exhausted = 0
+        self._lock = threading.Lock()
+        self.shape = None
+        self._free = []
+        self.reshape(shape)
+
+    def reshape(self, shape):
+        shape = tuple(shape)
+        with self._lock:
+            if shape == self.shape:
+                return
+            self.shape = shape
+            self._free = [PooledFrame(np.empty(shape, self.dtype), self) for _ in range(self.count)]
+
+    def acquire(self):
+        """A free buffer with one reference, or None when every buffer is in use."""
+        with self._lock:
+            if not self._free:
+                self.exhausted += 1
+                return None
+            frame = self._free.pop()
+            frame.refs = 1
+            return frame
+
+    def wrap(self, data):
+        """Track an externally allocated frame under the same rules (never pooled)."""
+        frame = PooledFrame(data, self)
+        frame.refs = 1
+        return frame
+
+    def _retain(self, frame):
+        with self._lock:
+            frame.refs += 1
+
+    def _release(self, frame):
+        with self._lock:
+            frame.refs -= 1
+            if frame.refs == 0 and frame.data.shape == self.shape and len(self._free) < self.count:
+                self._free.append(frame)
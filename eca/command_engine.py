@@ -1,93 +1,163 @@
+import json
+import os
+
+from .phrase_index import PhraseIndex
+
+DEFAULT_GRAMMAR = os.path.join(os.path.dirname(__file__), "grammar.json")
+
+
+def load_grammar(path=None):
+    """Read a grammar file, falling back to the bundled one."""
+    path = path or DEFAULT_GRAMMAR
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        if path == DEFAULT_GRAMMAR:
+            raise
+        print("COMMAND: Cannot load grammar", path, "-", e)
+        return load_grammar(None)
+
+
+def compile_grammar(grammar):
+    """
+    Token trie of every phrase in `grammar`: nested dicts keyed by word,
+    with the (action, value) of a complete phrase stored under None.
+    Returns (trie, phrases, aliases); phrases maps each normalized phrase
+    to its (action, value).
+    """
+    trie = {}
+    phrases = {}
+
+    def add(phrase, action, value=None):
+        words = phrase.lower().split()
+        node = trie
+        for word in words:
+            node = node.setdefault(word, {})
+        node[None] = (action, value)
+        phrases[" ".join(words)] = (action, value)
+
+    for cmd in grammar.get("commands", []):
+        for phrase in cmd["say"]:
+            add(phrase, cmd["action"], cmd.get("value"))
+    for phrase, symbol in grammar.get("symbols", {}).items():
+        add(phrase, "insert", symbol)
+    for phrase, snippet in grammar.get("snippets", {}).items():
+        add(phrase, "insert", snippet)
+    aliases = {k.lower(): v.lower() for k, v in grammar.get("aliases", {}).items()}
+    return trie, phrases, aliases
+
+
 class CommandEngine:
-    def __init__(self, logger):
+    """
+    Maps recognized speech to editor actions using a grammar file (see
+    eca/grammar.json) compiled into a token trie. interpret_all() splits an
+    utterance such as "colon new line indent" into several actions in one
+    left-to-right pass. A whole utterance, or the words right before or
+    after an exact phrase, may also be a misrecognized command ("colin new
+    line"): those are matched against a PhraseIndex and count when they
+    score at least `threshold`, or `word_threshold` for a single word.
+    Words inside ordinary dictation are never fuzzy matched.
+    """
+    def __init__(self, logger, grammar_path=None, threshold=0.8, word_threshold=0.95):
         self.logger = logger
         self.typing_enabled = True
-
-    def interpret(self, text):
-        t = text.lower().strip()
-
-        # -------- NORMALIZE SPEECH ERRORS --------
-        t = t.replace("inert", "insert")
-        t = t.replace("inside", "insert")
-        t = t.replace("intend", "indent")
-
+        self.threshold = threshold
+        self.word_threshold = word_threshold
+        self.grammar = load_grammar(grammar_path)
+        self.trie, self.phrases, self.aliases = compile_grammar(self.grammar)
+        self.index = PhraseIndex(self.phrases)
+        self.max_words = max((len(p.split()) for p in self.phrases), default=0)
+
+    def _tokens(self, text):
+        words = text.split()
+        return words, [self.aliases.get(w.lower(), w.lower()) for w in words]
+
+    def _match(self, tokens, start):
+        """Longest phrase starting at tokens[start] as (end, (action, value)), or None."""
+        node = self.trie
+        best = None
+        for i in range(start, len(tokens)):
+            node = node.get(tokens[i])
+            if node is None:
+                break
+            if None in node:
+                best = (i + 1, node[None])
+        return best
+
+    def match(self, text):
+        """Closest command phrase to `text` as (phrase, confidence), or None."""
+        return self.index.match(text)
+
+    def _fuzzy(self, tokens, start, ends):
+        """Best fuzzy phrase tokens[start:end] for an end in `ends` as (end, (action, value)), or None."""
+        best = None
+        for end in ends:
+            if not 0 < end - start <= self.max_words:
+                continue
+            hit = self.index.match(" ".join(tokens[start:end]))
+            threshold = self.word_threshold if end - start == 1 else self.threshold
+            if hit and hit[1] >= threshold and (best is None or hit[1] > best[1]):
+                best = (end, hit[1], self.phrases[hit[0]])
+        return best and (best[0], best[2])
+
+    def _gate(self, action, value):
         # -------- PAUSE / RESUME (ALWAYS ALLOWED) --------
-        if t in ("pause typing", "stop typing"):
+        if action == "pause":
             self.typing_enabled = False
-            return ("pause", "Typing paused")
-
-        if t in ("resume typing", "start typing"):
+        elif action == "resume":
             self.typing_enabled = True
-            return ("resume", "Typing resumed")
-
         # -------- BLOCK EVERYTHING ELSE WHEN PAUSED --------
-        if not self.typing_enabled:
+        elif not self.typing_enabled:
             return ("blocked", None)
+        return (action, value)
 
-        # -------- NAVIGATION / EDITING --------
-        if t in ("new line", "next line"):
-            return ("insert", "\n")
-
-        if t == "indent":
-            return ("insert", "    ")
-
-        if t == "dedent":
-            return ("dedent", None)
-
-        if t == "backspace":
-            return ("backspace", None)
-
-        if t == "delete line":
-            return ("delete_line", None)
-
-        if t == "clear line":
-            return ("clear_line", None)
-
-        # -------- SYMBOLS --------
-        symbols = {
-            "open bracket": "{",
-            "close bracket": "}",
-            "open parenthesis": "(",
-            "close parenthesis": ")",
-            "open square bracket": "[",
-            "close square bracket": "]",
-            "colon": ":",
-            "comma": ",",
-            "dot": ".",
-            "equals": "=",
-            "plus": "+",
-            "minus": "-",
-            "multiply": "*",
-            "divide": "/"
-        }
-
-        if t in symbols:
-            return ("insert", symbols[t])
-
-        # -------- CODE SNIPPETS --------
-        if t == "insert for loop":
-            return ("insert", "for i in range():\n    ")
-
-        if t == "insert while loop":
-            return ("insert", "while condition:\n    ")
-
-        if t == "insert if condition":
-            return ("insert", "if condition:\n    ")
-
-        if t == "insert else":
-            return ("insert", "else:\n    ")
-
-        if t == "insert function":
-            return ("insert", "def function_name():\n    ")
-
-        if t == "insert class":
-            return ("insert", "class ClassName:\n    def __init__(self):\n        ")
-
-        if t == "insert print":
-            return ("insert", "print()")
-
-        if t == "insert main":
-            return ("insert", "if __name__ == '__main__':\n    ")
-
-        # -------- FALLBACK (DICTATION) --------
-        return ("dictation", text)
\ No newline at end of file
+    def interpret(self, text):
+        """Single action for an utterance that is exactly one phrase, else dictation."""
+        words, tokens = self._tokens(text.strip())
+        hit = self._match(tokens, 0) if tokens else None
+        if not (hit and hit[0] == len(tokens)):
+            hit = self._fuzzy(tokens, 0, [len(tokens)]) if tokens else None
+        if hit and hit[0] == len(tokens):
+            return self._gate(*hit[1])
+        return self._gate("dictation", text)
+
+    def interpret_all(self, text):
+        """Ordered list of (action, value) for every phrase and dictation run in `text`."""
+        words, tokens = self._tokens(text)
+        exact = [self._match(tokens, i) for i in range(len(tokens))]
+        actions = []
+        dictation = []
+        i = 0
+        after_exact = False
+        while i < len(tokens):
+            hit = exact[i]
+            if hit is None:
+                # a fuzzy phrase may not swallow the start of an exact one; it must
+                # be the whole utterance or touch an exact phrase, as "colin" does
+                # in "colin new line": single words inside dictation stay dictation
+                stop = next((j for j in range(i + 1, len(tokens)) if exact[j]), len(tokens))
+                if after_exact:
+                    ends = range(stop, i, -1)
+                elif stop < len(tokens) or (i == 0 and not actions):
+                    ends = [stop]
+                else:
+                    ends = []
+                hit = self._fuzzy(tokens, i, ends)
+                after_exact = False
+            else:
+                after_exact = True
+            if hit is None:
+                dictation.append(words[i])
+                i += 1
+                continue
+            if dictation:
+                actions.append(self._gate("dictation", " ".join(dictation)))
+                dictation = []
+            i, (action, value) = hit
+            actions.append(self._gate(action, value))
+        if dictation:
+            actions.append(self._gate("dictation", " ".join(dictation)))
+        # one "blocked" is enough for a run of them
+        return [a for n, a in enumerate(actions)
+                if not (a[0] == "blocked" and n and actions[n - 1][0] == "blocked")]
@@ -0,0 +1,109 @@
+class DwellEngine:
+    """
+    Dwell selection timed by gaze sample timestamps rather than a sleeping
+    thread. Hover time on a target accumulates from the timestamps of the
+    samples that land on it; gaps longer than `max_gap` (tracker stalls)
+    do not count. Each key may have its own dwell time, and with `adaptive`
+    the base dwell shrinks after selections that stick and grows back after
+    ones the user immediately undoes.
+    """
+    def __init__(self, dwell_ms=900, per_key=None, adaptive=False, min_ms=450,
+                 max_gap=0.25, shrink=0.97, grow=1.15, undo_window=1.5, undo_key="BACKSPACE"):
+        self.base_ms = float(dwell_ms)
+        self.dwell_ms = float(dwell_ms)
+        self.per_key = dict(per_key or {})
+        self.adaptive = adaptive
+        self.min_ms = float(min(min_ms, dwell_ms))
+        self.max_gap = max_gap
+        self.shrink = shrink
+        self.grow = grow
+        self.undo_window = undo_window
+        self.undo_key = undo_key
+        self.target = None
+        self.key = None
+        self.elapsed = 0.0
+        self._last_ts = None
+        self._last_fire = None  # (key, ts)
+
+    @classmethod
+    def from_settings(cls, settings, dwell_ms=None):
+        return cls(
+            dwell_ms=dwell_ms if dwell_ms is not None else int(settings.get("dwell") or 900),
+            per_key=settings.get("dwell_per_key") or {},
+            adaptive=bool(settings.get("adaptive_dwell")),
+            min_ms=int(settings.get("dwell_min") or 450),
+        )
+
+    def dwell_for(self, key):
+        """Dwell time in seconds for `key`."""
+        ms = self.per_key.get(key)
+        return (float(ms) if ms is not None else self.dwell_ms) / 1000.0
+
+    @property
+    def progress(self):
+        if self.target is None:
+            return 0.0
+        return min(1.0, self.elapsed / self.dwell_for(self.key))
+
+    def remaining(self):
+        """Seconds of dwell left on the current target (None without a target)."""
+        if self.target is None:
+            return None
+        return max(0.0, self.dwell_for(self.key) - self.elapsed)
+
+    def update(self, target, key, ts):
+        """
+        Feed one gaze sample at time `ts` landing on `target` (None for no
+        key). Returns the key to select, or None.
+        """
+        if target is not self.target:
+            self.target = target
+            self.key = key
+            self.elapsed = 0.0
+            self._last_ts = ts
+            return None
+        if target is None:
+            return None
+        if self._last_ts is None:
+            self._last_ts = ts
+        elif ts > self._last_ts:
+            dt = ts - self._last_ts
+            if dt <= self.max_gap:
+                self.elapsed += dt
+            self._last_ts = ts
+        if self.elapsed >= self.dwell_for(key):
+            return self.fire(ts)
+        return None
+
+    def complete(self):
+        """Fire at the moment the current dwell runs out (for timer-driven completion)."""
+        ts = (self._last_ts or 0.0) + (self.remaining() or 0.0)
+        self._last_ts = ts
+        return self.fire(ts)
+
+    def fire(self, ts):
+        """Select the current target now; it must be dwelt on again to repeat."""
+        key = self.key
+        self.elapsed = 0.0
+        if self.adaptive:
+            self._adapt(key, ts)
+        self._last_fire = (key, ts)
+        return key
+
+    def _adapt(self, key, ts):
+        undo = (
+            key == self.undo_key and self._last_fire is not None
+            and self._last_fire[0] != self.undo_key
+            and ts - self._last_fire[1] <= self.undo_window
+        )
+        if undo:
+            # the previous selection was a mistake: slow down
+            self.dwell_ms = min(self.base_ms, self.dwell_ms * self.grow)
+        else:
+            self.dwell_ms = max(self.min_ms, self.dwell_ms * self.shrink)
+
+    def reset(self):
+        self.target = None
+        self.key = None
+        self.elapsed = 0.0
+        self._last_ts = None
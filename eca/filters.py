@@ -0,0 +1,85 @@
+import math
+from collections import deque
+
+
+class LowPass:
+    def __init__(self):
+        self.y = None
+
+    def __call__(self, x, alpha):
+        self.y = x if self.y is None else alpha * x + (1 - alpha) * self.y
+        return self.y
+
+
+def _alpha(cutoff, dt):
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """
+    One Euro filter (Casiez et al.): a low-pass whose cutoff rises with the
+    signal's speed. Driven by sample timestamps, so the lag does not depend
+    on the frame rate: heavy smoothing while fixating, little lag on saccades.
+    """
+    def __init__(self, min_cutoff=1.0, beta=1.5, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._x = LowPass()
+        self._dx = LowPass()
+        self._t = None
+
+    def __call__(self, x, t):
+        if self._t is None or t <= self._t:
+            dt = None
+        else:
+            dt = t - self._t
+        self._t = t
+        if dt is None:
+            if self._x.y is None:
+                self._dx.y = 0.0
+                return self._x(x, 1.0)
+            return self._x.y
+        dx = (x - self._x.y) / dt
+        edx = self._dx(dx, _alpha(self.d_cutoff, dt))
+        cutoff = self.min_cutoff + self.beta * abs(edx)
+        return self._x(x, _alpha(cutoff, dt))
+
+
+class FrameRate:
+    """Frame rate and frame-interval jitter over a sliding time window."""
+    def __init__(self, window=2.0, max_samples=512):
+        self.window = window
+        self._ts = deque(maxlen=max_samples)
+
+    def tick(self, t):
+        self._ts.append(t)
+        while len(self._ts) > 2 and t - self._ts[0] > self.window:
+            self._ts.popleft()
+
+    @property
+    def fps(self):
+        if len(self._ts) < 2:
+            return 0.0
+        span = self._ts[-1] - self._ts[0]
+        return (len(self._ts) - 1) / span if span > 0 else 0.0
+
+    @property
+    def jitter(self):
+        """Standard deviation of the frame interval in seconds."""
+        n = len(self._ts) - 1
+        if n < 2:
+            return 0.0
+        ts = self._ts
+        intervals = [ts[i + 1] - ts[i] for i in range(n)]
+        mean = sum(intervals) / n
+        return math.sqrt(sum((d - mean) ** 2 for d in intervals) / n)
+
+    @property
+    def max_interval(self):
+        ts = self._ts
+        return max((ts[i + 1] - ts[i] for i in range(len(ts) - 1)), default=0.0)
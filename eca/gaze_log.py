@@ -0,0 +1,105 @@
+"""
+Fixed-width binary format for gaze telemetry.
+
+File layout: a 16 byte header (magic, version, record size) followed by
+packed little-endian records of (ts float64, gx, gy, conf, fps float32).
+The records can be memory-mapped directly as a NumPy structured array.
+"""
+import json, os, struct, sys
+import numpy as np
+
+MAGIC = b"ECAGAZE\0"
+VERSION = 1
+HEADER = struct.Struct("<8sII")
+RECORD = struct.Struct("<dffff")
+GAZE_DTYPE = np.dtype([
+    ("ts", "<f8"),
+    ("gx", "<f4"),
+    ("gy", "<f4"),
+    ("conf", "<f4"),
+    ("fps", "<f4"),
+])
+assert GAZE_DTYPE.itemsize == RECORD.size
+
+
+def header_bytes():
+    return HEADER.pack(MAGIC, VERSION, RECORD.size)
+
+
+def pack_gaze(ts, g):
+    return RECORD.pack(ts, g.get("gx", 0.0), g.get("gy", 0.0), g.get("conf", 0.0), g.get("fps", 0.0))
+
+
+def read_gaze_log(path):
+    """
+    Return the session at `path` as a read-only structured array backed by
+    a memory map (no copy). A partially written trailing record is ignored.
+    Rotated segments compressed with gzip must be decompressed first.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        magic, version, rec_size = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or rec_size != GAZE_DTYPE.itemsize:
+        raise ValueError(f"{path}: not an ECA gaze log")
+    n = (size - HEADER.size) // rec_size
+    if n <= 0:
+        return np.zeros(0, dtype=GAZE_DTYPE)
+    return np.memmap(path, dtype=GAZE_DTYPE, mode="r", offset=HEADER.size, shape=(n,))
+
+
+def _iter_json_gaze(src):
+    with open(src, "r", encoding="utf-8") as f:
+        if src.endswith(".jsonl"):
+            for line in f:
+                try:
+                    ev = json.loads(line)
+                except ValueError:
+                    continue
+                if ev.get("ch") == "gaze":
+                    yield ev
+        else:
+            text = f.read()
+            try:
+                yield from json.loads(text).get("gaze", [])
+            except ValueError:
+                # the old writer rewrote the whole file per event, so an
+                # interrupted session leaves it truncated; salvage what parses
+                yield from _salvage_gaze(text)
+
+
+def _salvage_gaze(text):
+    dec = json.JSONDecoder()
+    start = text.find('"gaze"')
+    pos = text.find("[", start) + 1 if start >= 0 else 0
+    while 0 < pos < len(text):
+        pos = text.find("{", pos)
+        if pos < 0:
+            return
+        try:
+            ev, pos = dec.raw_decode(text, pos)
+        except ValueError:
+            return
+        yield ev
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(text) and text[pos] == "]":
+            return
+
+
+def convert_json_log(src, dst):
+    """Convert the gaze entries of a JSON (or JSON-lines) log into a binary gaze file."""
+    count = 0
+    with open(dst, "wb") as out:
+        out.write(header_bytes())
+        for ev in _iter_json_gaze(src):
+            out.write(pack_gaze(ev.get("ts", 0.0), ev))
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python -m eca.gaze_log <eca_logs.json> <eca_gaze.bin>")
+        sys.exit(2)
+    n = convert_json_log(sys.argv[1], sys.argv[2])
+    print(f"converted {n} gaze samples -> {sys.argv[2]}")
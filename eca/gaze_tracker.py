@@ -2,6 +2,13 @@ import threading, time, math, os
 import cv2
 import numpy as np
 
+from .pipeline import Mailbox
+from .capture import ResolutionPolicy, FramePool
+from .tracking import FaceRoi, HaarFaceTracker
+from .filters import OneEuroFilter, FrameRate
+from .instrument import perf
+from .inference_worker import FaceMeshWorker
+
 # Try to import MediaPipe; if not available, user must pip install mediapipe
 try:
     import mediapipe as mp
@@ -10,10 +17,24 @@ except Exception:
     mp = None
     MP_AVAILABLE = False
 
+NUM_LANDMARKS = 478
+# iris landmark indices (MediaPipe refined mesh), one row per eye
+IRIS_IDX = np.array([[468, 469, 470, 471], [473, 474, 475, 476]])
+# (outer, inner) eye corners and (upper, lower) lids, one row per eye
+EYE_CORNER_IDX = np.array([[33, 133], [362, 263]])
+EYE_LID_IDX = np.array([[159, 145], [386, 374]])
+ANNOTATE_LANDMARKS = 100
+
 class GazeTracker:
     """
     Iris-based gaze tracker using MediaPipe FaceMesh refined landmarks.
     FaceMesh instance is created when camera starts to avoid initialization issues.
+
+    Work is split into stages on separate threads joined by single-slot
+    "latest wins" mailboxes: capture -> inference -> logging. A slow stage
+    drops stale frames instead of stalling camera reads; the per-stage drop
+    counts are available from `drops`. Annotated frames are rendered only on
+    request (see `annotated_frame`).
     """
     def __init__(self, settings, logger):
         self.settings = settings
@@ -21,51 +42,122 @@ class GazeTracker:
         self.cap = None
         self.running = False
         self.frame = None
-        self.annotated = None
+        self.frame_seq = 0  # bumped for every published frame
+        # landmarks are written into two preallocated (478, 2) float32
+        # buffers; inference fills one while the other is published
+        self._lm_bufs = [np.zeros((NUM_LANDMARKS, 2), np.float32) for _ in range(2)]
+        self._lm_write = 0
+        self.landmarks = self._lm_bufs[1][:0]
+        self.iris_centers = None
+        self.eye_features = None
         self.gx = 0.5
         self.gy = 0.5
         self.conf = 0.0
+        self.ts = 0.0  # capture time of the sample behind gx/gy
         self.fps = 0.0
+        self.frame_jitter = 0.0
         self.lock = threading.Lock()
         self.smoothing = float(self.settings.get("smoothing") or 0.25)
-        self.thread = None
+        self.filter_mode = self.settings.get("gaze_filter") or "one_euro"
+        euro = dict(
+            min_cutoff=float(self.settings.get("one_euro_min_cutoff") or 1.0),
+            beta=float(self.settings.get("one_euro_beta") or 1.5),
+        )
+        self._filters = (OneEuroFilter(**euro), OneEuroFilter(**euro))
+        self._rate = FrameRate(window=2.0)
+        self.log_enabled = bool(self.settings.get("pipeline_log"))
+        self.roi = FaceRoi(padding=float(self.settings.get("roi_padding") or 0.35)) \
+            if self.settings.get("roi_tracking") else None
+        self.resolution = ResolutionPolicy.from_settings(self.settings)
+        self._pending_mode = None
+        # frame buffers are reused; see FramePool for who releases what
+        mw, mh = self.resolution.mode
+        self._pool = FramePool((mh, mw, 3))
+        self._frame_ref = None
+        self._read_into = True
+        self._rgb_flat = np.empty(0, np.uint8)
+        self.threads = []
+        self.use_mediapipe = MP_AVAILABLE
         self._mp_face = None
+        self._mp_face_static = None
+        self._worker = None
+        self._haar = None
+        self._frames = Mailbox("capture", on_drop=lambda item: item[0].release())
+        self._to_log = Mailbox("log")
 
-    def start(self, cam_index=0):
+    def start(self, cam_index=0, source=None):
+        """
+        Start the pipeline on camera `cam_index`, or on `source`, any object
+        with the cv2.VideoCapture read()/isOpened()/release() interface.
+        """
         if self.running:
             return
-        # initialize camera capture robustly
-        self.cap = cv2.VideoCapture(cam_index, cv2.CAP_DSHOW if os.name == 'nt' else cam_index)
-        # set capture properties (helpful on Windows)
-        try:
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            self.cap.set(cv2.CAP_PROP_FPS, 30)
-        except Exception:
-            pass
-
-        # initialize MediaPipe FaceMesh once
-        if MP_AVAILABLE and self._mp_face is None:
+        if source is not None:
+            self.cap = source
+        else:
+            # initialize camera capture robustly
+            self.cap = cv2.VideoCapture(cam_index, cv2.CAP_DSHOW if os.name == 'nt' else cam_index)
+            # set capture properties (helpful on Windows)
+            self._apply_mode(self.resolution.mode)
             try:
-                mp_face_mesh = mp.solutions.face_mesh
-                self._mp_face = mp_face_mesh.FaceMesh(
-                    static_image_mode=False,
-                    max_num_faces=1,
-                    refine_landmarks=True,
-                    min_detection_confidence=0.5,
-                    min_tracking_confidence=0.5,
-                )
-                print("MediaPipe FaceMesh initialized")
-            except Exception as e:
-                print("MediaPipe init failed:", e)
-                self._mp_face = None
+                self.cap.set(cv2.CAP_PROP_FPS, self.resolution.target_fps)
+                # keep the driver queue short; the capture stage always reads the newest frame
+                self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            except Exception:
+                pass
+            self._read_camera_fps()
+
+        self.init_detectors()
 
         self.running = True
-        self.thread = threading.Thread(target=self._run, daemon=True)
-        self.thread.start()
+        stages = [self._capture_loop, self._infer_loop]
+        if self.log_enabled:
+            stages.append(self._log_loop)
+        for box in (self._frames, self._to_log):
+            box.reopen()
+        self.threads = [threading.Thread(target=fn, daemon=True) for fn in stages]
+        for t in self.threads:
+            t.start()
+
+    def init_detectors(self):
+        if self.use_mediapipe and self.settings.get("inference_process"):
+            # FaceMesh runs in a worker process; frames go through shared memory
+            if self._worker is None:
+                self._worker = FaceMeshWorker(max_size=self.resolution.ladder[self.resolution.top],
+                                              still_images=self.roi is not None)
+                self._worker.start()
+        # initialize MediaPipe FaceMesh once
+        elif self.use_mediapipe and self._mp_face is None:
+            self._init_facemesh()
+        if self._haar is None:
+            cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+            self._haar = HaarFaceTracker.from_settings(cascade, self.settings)
+
+    def _init_facemesh(self):
+        try:
+            mp_face_mesh = mp.solutions.face_mesh
+            options = dict(max_num_faces=1, refine_landmarks=True,
+                           min_detection_confidence=0.5, min_tracking_confidence=0.5)
+            self._mp_face = mp_face_mesh.FaceMesh(static_image_mode=False, **options)
+            # ROI crops move with the face, which would mislead the video-mode
+            # tracker's frame-to-frame landmarks: they get a still-image instance
+            self._mp_face_static = mp_face_mesh.FaceMesh(static_image_mode=True, **options) \
+                if self.roi else None
+            print("MediaPipe FaceMesh initialized")
+        except Exception as e:
+            print("MediaPipe init failed:", e)
+            self._mp_face = self._mp_face_static = None
 
     def stop(self):
         self.running = False
+        for box in (self._frames, self._to_log):
+            box.close()
+        # let the capture stage leave cap.read() before releasing the device;
+        # the inference stage may be waiting up to the worker's timeout
+        join_timeout = 1.0 + (self._worker.timeout if self._worker else 0.0)
+        for t in self.threads:
+            t.join(timeout=join_timeout)
+        self.threads = []
         if self.cap:
             try:
                 self.cap.release()
@@ -73,99 +165,259 @@ class GazeTracker:
                 pass
             self.cap = None
         # do not close self._mp_face here; keep for reuse
+        if self._worker:
+            self._worker.stop()
+            self._worker = None
+
+    @property
+    def drops(self):
+        """Frames each stage skipped because a newer one arrived first."""
+        return {box.name: box.dropped for box in (self._frames, self._to_log)}
+
+    @property
+    def annotated(self):
+        return self.annotated_frame()
+
+    def annotated_frame(self, size=None, dst=None):
+        """
+        Render the latest frame with its landmarks at `size` (w, h), or at
+        full resolution when size is None. The lock is only held to grab
+        references; resizing and drawing happen outside it. Pass `dst`
+        (an array of the target shape) to render without allocating.
+        """
+        with self.lock:
+            frame = self.frame
+            # keep the pool buffer alive while we read it outside the lock
+            ref = self._frame_ref.retain() if self._frame_ref else None
+            lm_coords = self.landmarks[:ANNOTATE_LANDMARKS].copy()
+            centers = self.iris_centers
+        if frame is None:
+            return None
+        try:
+            with perf.stage("annotate"):
+                if size is None and dst is None:
+                    img = frame.copy()
+                elif size is None:
+                    np.copyto(dst, frame)
+                    img = dst
+                else:
+                    img = cv2.resize(frame, size, dst=dst, interpolation=cv2.INTER_AREA)
+                return self._annotate(img, lm_coords, centers)
+        finally:
+            if ref:
+                ref.release()
 
-    def _annotate(self, frame, lm_coords, left_center=None, right_center=None):
-        img = frame.copy()
+    def _annotate(self, img, lm_coords, centers=None):
+        # draws in place on img (already a private copy at the target size)
         h,w = img.shape[:2]
-        # draw landmarks provided (limit to avoid heavy drawing)
-        for (x,y) in lm_coords[:100]:
-            cv2.circle(img, (int(x*w), int(y*h)), 1, (0,255,0), -1)
-        if left_center:
-            cv2.circle(img, (int(left_center[0]*w), int(left_center[1]*h)), 3, (0,0,255), -1)
-        if right_center:
-            cv2.circle(img, (int(right_center[0]*w), int(right_center[1]*h)), 3, (255,0,0), -1)
+        if len(lm_coords):
+            # 5-pixel plus marks for all landmarks at once
+            pts = (lm_coords * (w, h)).astype(np.int32)
+            for dx, dy in ((0, 0), (-1, 0), (1, 0), (0, -1), (0, 1)):
+                xs = np.clip(pts[:, 0] + dx, 0, w - 1)
+                ys = np.clip(pts[:, 1] + dy, 0, h - 1)
+                img[ys, xs] = (0, 255, 0)
+        if centers is not None:
+            (lx, ly), (rx, ry) = (centers * (w, h)).astype(int)
+            cv2.circle(img, (lx, ly), 3, (0,0,255), -1)
+            cv2.circle(img, (rx, ry), 3, (255,0,0), -1)
         return img
 
-    def _run(self):
-        prev_time = time.time()
-        frame_count = 0
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    def _apply_mode(self, mode):
+        try:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, mode[0])
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, mode[1])
+        except Exception:
+            pass
+        self._read_camera_fps()
+
+    def _read_camera_fps(self):
+        # many cameras deliver fewer FPS than requested (or fewer at some sizes);
+        # the resolution policy must not blame the tracker for that
+        try:
+            self.resolution.camera_fps = float(self.cap.get(cv2.CAP_PROP_FPS)) or None
+        except Exception:
+            self.resolution.camera_fps = None
+
+    # ================= STAGES =================
+    def _capture_loop(self):
         while self.running and self.cap and self.cap.isOpened():
-            ret, frame = self.cap.read()
+            mode, self._pending_mode = self._pending_mode, None
+            if mode:
+                # capture properties may only be touched from the capture thread
+                print("Capture resolution ->", mode)
+                self._apply_mode(mode)
+            buf = self._pool.acquire() if self._read_into else None
+            with perf.stage("camera.read"):
+                try:
+                    ret, frame = self.cap.read(image=buf.data) if buf else self.cap.read()
+                except TypeError:
+                    # source without cv2's read(image=...) support
+                    self._read_into = False
+                    ret, frame = self.cap.read()
             if not ret:
+                if buf:
+                    buf.release()
+                perf.count("camera.read_failed")
                 time.sleep(0.05)
                 continue
-            frame_count += 1
-            now = time.time()
-            h, w = frame.shape[:2]
-            gx = 0.5; gy = 0.5; conf = 0.0
-            left_center = None; right_center = None
-            lm_coords = []
-
-            if MP_AVAILABLE and self._mp_face:
-                try:
-                    img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    results = self._mp_face.process(img_rgb)
-                    if results.multi_face_landmarks:
-                        # debug print for detection (prints infrequently)
-                        # print("✔️ Face detected")
-                        face_lms = results.multi_face_landmarks[0]
-                        # collect some landmarks for annotation
-                        for lm in face_lms.landmark:
-                            lm_coords.append((lm.x, lm.y))
-                        # iris landmark indices (MediaPipe)
-                        left_idx = [468,469,470,471]
-                        right_idx = [473,474,475,476]
-                        try:
-                            lpts = [(face_lms.landmark[i].x, face_lms.landmark[i].y) for i in left_idx]
-                            rpts = [(face_lms.landmark[i].x, face_lms.landmark[i].y) for i in right_idx]
-                            lx = sum([p[0] for p in lpts]) / len(lpts)
-                            ly = sum([p[1] for p in lpts]) / len(lpts)
-                            rx = sum([p[0] for p in rpts]) / len(rpts)
-                            ry = sum([p[1] for p in rpts]) / len(rpts)
-                            left_center = (lx, ly)
-                            right_center = (rx, ry)
-                            gx = (lx + rx) / 2.0
-                            gy = (ly + ry) / 2.0
-                            gx = 1 - gx  # Flip horizontal for correct direction
-                            conf = 0.9
-                        except Exception:
-                            gx = 0.5; gy = 0.5; conf = 0.0
-                    else:
-                        # no face landmarks
-                        # print("❌ No face detected")
-                        gx = 0.5; gy = 0.5; conf = 0.0
-                except Exception as e:
-                    # if MediaPipe processing fails, fallback
-                    print("MediaPipe processing exception:", e)
-                    gx = 0.5; gy = 0.5; conf = 0.0
-            else:
-                # fallback: coarse face detection using Haar cascade to get face center
-                try:
-                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                    faces = face_cascade.detectMultiScale(gray, 1.1, 4)
-                    if len(faces)>0:
-                        x,y,wf,hf = faces[0]
-                        gx = (x + wf/2.0) / w
-                        gy = (y + hf/2.0) / h
-                        gx = 1 - gx  # Flip horizontal for correct direction
-                        conf = 0.4
-                    else:
-                        gx = 0.5; gy = 0.5; conf = 0.0
-                except Exception:
-                    gx = 0.5; gy = 0.5; conf = 0.0
-
-            # smoothing (EWMA)
-            with self.lock:
+            if buf is None or frame is not buf.data:
+                # pool exhausted, or the driver allocated a new size: adopt it
+                if buf:
+                    buf.release()
+                    self._pool.reshape(frame.shape)
+                else:
+                    perf.count("pool.exhausted")
+                buf = self._pool.wrap(frame)
+            self._frames.put((buf, time.time()))
+
+    def _infer_loop(self):
+        while self.running:
+            item = self._frames.get(timeout=0.5)
+            if item is None:
+                continue
+            buf, ts = item
+            sample = self.process(buf.data, ts, owner=buf)
+            if self.log_enabled:
+                self._to_log.put(sample)
+
+    def process(self, frame, now, owner=None):
+        """
+        Run detection and smoothing on one frame captured at time `now` and
+        publish the result. Returns the gaze sample to log. `owner` is the
+        pool reference of `frame`; publishing takes it over.
+        """
+        with perf.stage("gaze.detect"):
+            gx, gy, conf, lm_coords, centers, features = self._detect(frame)
+        mode = self.resolution.tick(now)
+        if mode:
+            self._pending_mode = mode
+
+        self._rate.tick(now)
+        with self.lock:
+            if self.filter_mode == "ewma":
                 alpha = float(self.smoothing)
                 self.gx = alpha * gx + (1-alpha) * self.gx
                 self.gy = alpha * gy + (1-alpha) * self.gy
-                self.conf = float(conf)
-                self.frame = frame
-                self.annotated = self._annotate(frame, lm_coords, left_center, right_center)
-                frame_count_local = frame_count
-                elapsed = now - prev_time
-                self.fps = frame_count_local / max(0.001, elapsed)
-
-            self.logger.log_gaze({"gx": float(self.gx), "gy": float(self.gy), "conf": float(self.conf), "fps": float(self.fps)})
-            time.sleep(0.01)
+            else:
+                # adaptive smoothing driven by the capture timestamp
+                self.gx = self._filters[0](gx, now)
+                self.gy = self._filters[1](gy, now)
+            self.conf = float(conf)
+            self.ts = now
+            self.frame = frame
+            self.frame_seq += 1
+            old_ref, self._frame_ref = self._frame_ref, owner
+            self.landmarks = lm_coords
+            self.iris_centers = centers
+            self.eye_features = features
+            if len(lm_coords):
+                self._lm_write ^= 1
+            self.fps = self._rate.fps
+            self.frame_jitter = self._rate.jitter
+            sample = {"gx": float(self.gx), "gy": float(self.gy), "conf": float(self.conf), "fps": float(self.fps)}
+        if old_ref:
+            old_ref.release()
+        return sample
+
+    def _log_loop(self):
+        while self.running:
+            sample = self._to_log.get(timeout=0.5)
+            if sample is not None:
+                self.logger.log_gaze(sample)
+
+    # ================= DETECTION =================
+    def _detect(self, frame):
+        h, w = frame.shape[:2]
+        gx = 0.5; gy = 0.5; conf = 0.0
+        centers = None; features = None
+        lm_coords = self._lm_bufs[0][:0]
+
+        if self.use_mediapipe and (self._mp_face or self._worker):
+            try:
+                img, rect = self.roi.crop(frame) if self.roi else (frame, None)
+                buf = self._lm_bufs[self._lm_write]
+                n = self._facemesh(img, buf, static=rect is not None)
+                if not n and rect is not None:
+                    # lost the face inside the ROI: search the full frame again
+                    self.roi.reset()
+                    perf.count("roi.lost")
+                    rect = None
+                    n = self._facemesh(frame, buf)
+                if n:
+                    lm_coords = FaceRoi.to_frame(buf[:n], rect, w, h)
+                    if self.roi:
+                        self.roi.update(lm_coords, w, h)
+                    if n == NUM_LANDMARKS:
+                        centers, features = self._eye_geometry(buf)
+                        gx, gy = centers.mean(axis=0)
+                        gx = 1 - gx  # Flip horizontal for correct direction
+                        conf = 0.9
+            except Exception as e:
+                # if MediaPipe processing fails, fallback
+                print("MediaPipe processing exception:", e)
+                gx = 0.5; gy = 0.5; conf = 0.0
+                centers = None; features = None
+        else:
+            # fallback: coarse face centre from a downscaled Haar cascade plus tracking
+            try:
+                with perf.stage("haar.locate"):
+                    face = self._haar.locate(frame)
+                if face:
+                    gx, gy, conf = face
+                    gx = 1 - gx  # Flip horizontal for correct direction
+            except Exception:
+                gx = 0.5; gy = 0.5; conf = 0.0
+
+        return float(gx), float(gy), conf, lm_coords, centers, features
+
+    def _facemesh(self, img, buf, static=False):
+        """
+        Landmarks of the face in BGR `img`, written into `buf`; returns their
+        count. `static` is set for ROI crops, which are not a steady video.
+        """
+        if self._worker and self._worker.failed:
+            print("FaceMesh worker unavailable; running FaceMesh in-process")
+            self._worker.stop()
+            self._worker = None
+            self._init_facemesh()
+            if self._mp_face is None:
+                return 0
+        if self._worker:
+            with perf.stage("facemesh.worker"):
+                return self._worker.infer(img, buf, static)
+        with perf.stage("cvtColor"):
+            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=self._rgb_buffer(img.shape))
+        with perf.stage("facemesh.process"):
+            mesh = self._mp_face_static if static and self._mp_face_static else self._mp_face
+            results = mesh.process(img_rgb)
+        if not results.multi_face_landmarks:
+            return 0
+        face_lms = results.multi_face_landmarks[0].landmark
+        n = min(len(face_lms), NUM_LANDMARKS)
+        buf[:n] = np.fromiter(
+            (v for lm in face_lms[:n] for v in (lm.x, lm.y)), np.float32, count=2 * n
+        ).reshape(n, 2)
+        return n
+
+    def _rgb_buffer(self, shape):
+        # contiguous view on one flat buffer, grown only for a larger frame
+        size = shape[0] * shape[1] * 3
+        if self._rgb_flat.size < size:
+            self._rgb_flat = np.empty(size, np.uint8)
+        return self._rgb_flat[:size].reshape(shape[0], shape[1], 3)
+
+    @staticmethod
+    def _eye_geometry(lm):
+        """
+        Iris centres (2, 2) and iris position within each eye (2, 2), as
+        fractions along the corner-to-corner and lid-to-lid axes.
+        """
+        centers = lm[IRIS_IDX].mean(axis=1)
+        corners = lm[EYE_CORNER_IDX]
+        lids = lm[EYE_LID_IDX]
+        h_axis = corners[:, 1] - corners[:, 0]
+        v_axis = lids[:, 1] - lids[:, 0]
+        h = np.einsum("ij,ij->i", centers - corners[:, 0], h_axis) / np.maximum(np.einsum("ij,ij->i", h_axis, h_axis), 1e-9)
+        v = np.einsum("ij,ij->i", centers - lids[:, 0], v_axis) / np.maximum(np.einsum("ij,ij->i", v_axis, v_axis), 1e-9)
+        return centers, np.stack([h, v], axis=1)
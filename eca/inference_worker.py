@@ -0,0 +1,205 @@
+"""
+FaceMesh inference in a separate process.
+
+Frames are copied into a ring of slots in one multiprocessing.shared_memory
+block; only (seq, slot, h, w) goes over the request queue and only the
+packed float32 landmarks come back, so the UI process keeps its GIL for Tk,
+the keyboard and speech capture. A worker that dies or stops answering is
+restarted, with exponential backoff between attempts; after `max_restarts`
+consecutive failures it is marked `failed` and the caller should fall back
+to in-process inference. With `still_images`, crops (static=True) go to
+a separate static-image FaceMesh so they never disturb the video-mode
+tracker; both are built before the worker reports ready.
+"""
+import queue, time
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+NUM_LANDMARKS = 478
+
+
+def _worker_main(shm_name, slot_bytes, requests, results, still_images=False):
+    import mediapipe as mp
+    shm = shared_memory.SharedMemory(name=shm_name)
+    meshes = {}
+
+    def mesh(static):
+        if static not in meshes:
+            meshes[static] = mp.solutions.face_mesh.FaceMesh(
+                static_image_mode=static,
+                max_num_faces=1,
+                refine_landmarks=True,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5,
+            )
+        return meshes[static]
+
+    # building a graph takes longer than a request may; never do it mid-request
+    mesh(False)
+    if still_images:
+        mesh(True)
+    results.put((-1, b"ready"))
+    try:
+        while True:
+            item = requests.get()
+            if item is None:
+                break
+            seq, slot, h, w, static = item
+            frame = np.ndarray((h, w, 3), np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+            out = mesh(static).process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            del frame
+            data = None
+            if out.multi_face_landmarks:
+                lms = out.multi_face_landmarks[0].landmark
+                n = min(len(lms), NUM_LANDMARKS)
+                data = np.fromiter((v for lm in lms[:n] for v in (lm.x, lm.y)), np.float32, count=2 * n).tobytes()
+            results.put((seq, data))
+    finally:
+        for face in meshes.values():
+            face.close()
+        shm.close()
+
+
+class FaceMeshWorker:
+    def __init__(self, max_size=(1280, 720), slots=2, timeout=1.0,
+                 max_restarts=5, backoff=0.5, max_backoff=30.0, still_images=False):
+        self.still_images = still_images
+        self.max_size = max_size
+        self.slot_bytes = max_size[0] * max_size[1] * 3
+        self.slots = slots
+        self.timeout = timeout
+        self.max_restarts = max_restarts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.restarts = 0
+        self.failures = 0  # consecutive, reset by any answer
+        self.failed = False
+        self.stopped = False
+        self.ready = False
+        self.proc = None
+        self._shm = None
+        self._seq = 0
+        self._retry_at = 0.0
+        # held for a whole request so stop() cannot free the shared memory under it
+        self._lock = threading.Lock()
+        self._ctx = multiprocessing.get_context("spawn")
+
+    def start(self):
+        if self.stopped:
+            return
+        if self._shm is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * self.slots)
+        self._requests = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self.ready = False
+        self.proc = self._ctx.Process(
+            target=_worker_main,
+            args=(self._shm.name, self.slot_bytes, self._requests, self._results, self.still_images),
+            daemon=True,
+        )
+        self.proc.start()
+        print("FaceMesh worker started, pid", self.proc.pid)
+
+    def restart(self):
+        if self.stopped or self.failed:
+            return
+        self.restarts += 1
+        print("FaceMesh worker restarting")
+        self._kill()
+        self.start()
+
+    def _fail(self, reason):
+        """Count a failed request; restart later with backoff, or give up."""
+        self.failures += 1
+        self._kill()
+        if self.failures > self.max_restarts:
+            self.failed = True
+            print(f"FaceMesh worker failed {self.failures} times in a row ({reason}); giving up")
+            return
+        delay = min(self.max_backoff, self.backoff * 2 ** (self.failures - 1))
+        self._retry_at = time.monotonic() + delay
+        print(f"FaceMesh worker {reason}; restarting in {delay:.1f}s")
+
+    def _kill(self):
+        if self.proc is not None:
+            if self.proc.is_alive():
+                self.proc.terminate()
+            self.proc.join(timeout=1.0)
+            self.proc = None
+
+    def stop(self):
+        self.stopped = True
+        # a request in progress is bounded by `timeout`; let it finish before freeing its buffers
+        with self._lock:
+            if self.proc is not None and self.proc.is_alive():
+                try:
+                    self._requests.put(None)
+                    self.proc.join(timeout=2.0)
+                except Exception:
+                    pass
+            self._kill()
+            if self._shm is not None:
+                self._shm.close()
+                self._shm.unlink()
+                self._shm = None
+
+    def infer(self, img, out, static=False):
+        """
+        Run FaceMesh on BGR `img`; writes normalized landmarks into `out`
+        ((478, 2) float32) and returns how many were found (0 = no face).
+        `static` treats `img` as an unrelated still, e.g. a moving crop.
+        """
+        with self._lock:
+            if self.stopped or self.failed:
+                return 0
+            return self._infer(img, out, static)
+
+    def _infer(self, img, out, static):
+        if self.proc is None or not self.proc.is_alive():
+            if self.proc is not None:
+                self._fail("died")
+            elif time.monotonic() >= self._retry_at:
+                self.restart()
+            return 0
+        if not self.ready:
+            # worker still importing mediapipe; don't block the pipeline on it
+            try:
+                self._results.get_nowait()
+                self.ready = True
+            except queue.Empty:
+                return 0
+
+        h, w = img.shape[:2]
+        if h * w * 3 > self.slot_bytes:
+            # landmarks are normalized, so a downscaled copy gives the same result
+            scale = (self.slot_bytes / (h * w * 3)) ** 0.5
+            w, h = int(w * scale), int(h * scale)
+            img = cv2.resize(img, (w, h), interpolation=cv2.INTER_AREA)
+        seq = self._seq
+        self._seq += 1
+        slot = seq % self.slots
+        view = np.ndarray((h, w, 3), np.uint8, buffer=self._shm.buf, offset=slot * self.slot_bytes)
+        view[...] = img
+        del view
+        self._requests.put((seq, slot, h, w, bool(static and self.still_images)))
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                rseq, data = self._results.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                self._fail("timed out")
+                return 0
+            # skip answers to requests that timed out earlier
+            if rseq == seq:
+                break
+        self.failures = 0
+        if data is None:
+            return 0
+        n = len(data) // 8
+        out[:n] = np.frombuffer(data, np.float32).reshape(n, 2)
+        return n
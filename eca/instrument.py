@@ -0,0 +1,147 @@
+"""
+Lightweight always-available timing for the hot paths.
+
+    from .instrument import perf
+    with perf.stage("facemesh.process"):
+        ...
+    perf.count("capture.frames")
+
+While `perf.enabled` is False, stage() returns a shared no-op context
+manager and count() returns immediately, so instrumented code costs a
+method call and an attribute check. Enabled, each stage keeps a count,
+total, max and a log2 latency histogram.
+"""
+import functools, json, threading, time
+from contextlib import nullcontext
+
+# histogram bucket i holds samples below 2**i microseconds (last bucket is open)
+NUM_BUCKETS = 24
+_NULL = nullcontext()
+
+
+class StageStats:
+    __slots__ = ("count", "total", "max", "buckets", "lock")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * NUM_BUCKETS
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        us = int(seconds * 1e6)
+        idx = min(us.bit_length(), NUM_BUCKETS - 1)
+        with self.lock:
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+            self.buckets[idx] += 1
+
+    def percentile(self, q):
+        """Upper bound (seconds) of the bucket holding the q-th percentile."""
+        if not self.count:
+            return 0.0
+        target = q / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min((1 << i) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total * 1000.0 / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000.0,
+            "p90_ms": self.percentile(90) * 1000.0,
+            "p99_ms": self.percentile(99) * 1000.0,
+            "max_ms": self.max * 1000.0,
+        }
+
+
+class _Timer:
+    __slots__ = ("stats", "t0")
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.add(time.perf_counter() - self.t0)
+        return False
+
+
+class Instruments:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._since = time.time()
+
+    def _stats(self, name):
+        st = self.stages.get(name)
+        if st is None:
+            with self._lock:
+                st = self.stages.setdefault(name, StageStats())
+        return st
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL
+        return _Timer(self._stats(name))
+
+    def record(self, name, seconds):
+        if self.enabled:
+            self._stats(name).add(seconds)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def timed(self, name):
+        """Decorator form of stage()."""
+        def wrap(fn):
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+            return inner
+        return wrap
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.counters = {}
+            self._since = time.time()
+
+    def snapshot(self):
+        return {
+            "since": self._since,
+            "elapsed_s": time.time() - self._since,
+            "stages": {name: st.summary() for name, st in sorted(self.stages.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def overlay_text(self, names=None, max_items=5):
+        """One-line p50 summary for the status bar, slowest stages first."""
+        stages = self.stages if names is None else {n: self.stages[n] for n in names if n in self.stages}
+        ranked = sorted(stages.items(), key=lambda kv: -kv[1].percentile(50))[:max_items]
+        if not ranked:
+            return ""
+        return " | ".join(f"{name} {st.percentile(50) * 1000.0:.1f}" for name, st in ranked) + " ms p50"
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+perf = Instruments()
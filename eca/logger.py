@@ -1,24 +1,270 @@
-import json, time, os
+import json, time, os, glob, gzip, shutil
+import threading, queue, atexit
+from collections import deque
+
+from .gaze_log import RECORD, header_bytes, pack_gaze
+from .settings import DEFAULTS
+from .instrument import perf
+
+CHANNELS = ("gaze", "keys", "voice", "calibration")
+
+
+class _Segment:
+    """
+    Active log file that rotates by size and age. Closed segments are renamed
+    to <stem>-<timestamp><ext>, optionally gzipped, and only the newest
+    `keep` of them are retained. Compression runs on one background thread
+    per segment, one file at a time; files still waiting for it are never
+    pruned.
+    """
+    def __init__(self, path, mode, header=None, max_bytes=0, max_age=0, keep=5, compress=False, record_size=0):
+        self.path = path
+        self.mode = mode
+        self.header = header
+        self.record_size = record_size
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.keep = keep
+        self.compress = compress
+        self.f = None
+        self._pending = set()  # rotated files not yet compressed
+        self._lock = threading.Lock()
+        self._compress_queue = None
+        self._compressor = None
+        self._open()
+
+    def _open(self):
+        if self.record_size and os.path.exists(self.path):
+            self._trim()
+        self.f = open(self.path, self.mode, **({} if "b" in self.mode else {"encoding": "utf-8"}))
+        if self.header is not None and self.f.tell() == 0:
+            self.f.write(self.header)
+        self.opened = time.time()
+
+    def _trim(self):
+        # a crash can leave half a record at the end; appending after it would
+        # misalign every later record, so cut the file back to whole records
+        size = os.path.getsize(self.path)
+        head = len(self.header or b"")
+        whole = head + (size - head) // self.record_size * self.record_size if size >= head else 0
+        if whole != size:
+            print("Log: dropping", size - whole, "trailing bytes of", self.path)
+            os.truncate(self.path, whole)
+
+    def _due(self):
+        if self.max_bytes and self.f.tell() >= self.max_bytes:
+            return True
+        return bool(self.max_age) and time.time() - self.opened >= self.max_age
+
+    def write(self, data):
+        if not data:
+            return
+        if self._due():
+            self.rotate()
+        self.f.write(data)
+
+    def flush(self):
+        self.f.flush()
+
+    def rotate(self):
+        self.f.close()
+        stem, ext = os.path.splitext(self.path)
+        ms = int(time.time() * 1000)
+        while True:
+            closed = f"{stem}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(ms / 1000))}-{ms % 1000:03d}{ext}"
+            # two rotations within a millisecond must not overwrite a closed segment
+            with self._lock:
+                taken = closed in self._pending
+            if not taken and not os.path.exists(closed) and not os.path.exists(closed + ".gz"):
+                break
+            ms += 1
+        try:
+            os.replace(self.path, closed)
+        except OSError as e:
+            print("Log rotation failed:", e)
+            closed = None
+        self._open()
+        if closed and self.compress:
+            # compress off the writer thread so a large segment never stalls logging
+            with self._lock:
+                self._pending.add(closed)
+            if self._compressor is None:
+                self._compress_queue = queue.Queue()
+                self._compressor = threading.Thread(target=self._compress_loop, daemon=True)
+                self._compressor.start()
+            self._compress_queue.put(closed)
+        else:
+            self._prune()
+
+    def _compress_loop(self):
+        while True:
+            closed = self._compress_queue.get()
+            if closed is None:
+                break
+            self._compress(closed)
+            self._prune()
+
+    def _compress(self, closed):
+        # written under a temporary name so a half-written archive never counts as a segment
+        tmp = closed + ".gz.tmp"
+        try:
+            with open(closed, "rb") as src, gzip.open(tmp, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp, closed + ".gz")
+            os.remove(closed)
+        except Exception as e:
+            print("Log compression failed:", e)
+        finally:
+            with self._lock:
+                self._pending.discard(closed)
+
+    def _prune(self):
+        stem, ext = os.path.splitext(self.path)
+        segments = sorted(glob.glob(f"{glob.escape(stem)}-*{ext}") + glob.glob(f"{glob.escape(stem)}-*{ext}.gz"),
+                          key=os.path.basename)
+        with self._lock:
+            pending = set(self._pending)
+        for old in segments[:max(0, len(segments) - self.keep)]:
+            if old in pending:
+                continue
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def close(self, timeout=5.0):
+        self.f.close()
+        if self._compressor is not None:
+            # let queued segments finish compressing
+            self._compress_queue.put(None)
+            self._compressor.join(timeout)
+
+
 class Logger:
-    def __init__(self, path=None):
-        self.path = path or os.path.join(os.getcwd(), "eca_logs.json")
-        self._data = {"gaze": [], "keys": [], "voice": [], "calibration": []}
-        self._save()
-    def _save(self):
+    """
+    Append-only JSON-lines event log.
+    Gaze samples go to a separate fixed-width binary file (see gaze_log).
+    Events are queued and written in batches by a background thread so that
+    logging costs O(1) per event regardless of session length; the files
+    are flushed once `flush_interval` seconds have passed since the last
+    flush, or when the queue runs dry after it. Both files
+    rotate by size and age; only the most recent events of each channel are
+    kept in memory (see `recent`).
+    """
+    def __init__(self, path=None, gaze_path=None, settings=None, queue_size=4096, batch_size=256, flush_interval=0.5):
+        opt = settings.get if settings else DEFAULTS.get
+        self.path = path or os.path.join(os.getcwd(), "eca_logs.jsonl")
+        self.gaze_path = gaze_path or os.path.join(os.path.dirname(self.path), "eca_gaze.bin")
+        self.rotation = {
+            "max_bytes": int(opt("log_max_bytes") or 0),
+            "max_age": float(opt("log_max_age") or 0),
+            "keep": int(opt("log_keep_segments") or 0),
+            "compress": bool(opt("log_compress")),
+        }
+        retain = {**DEFAULTS["log_retain"], **(opt("log_retain") or {})}
+        self._data = {ch: deque(maxlen=int(retain.get(ch, 0))) for ch in CHANNELS}
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def recent(self, channel):
+        """Most recent events of a channel, capped by the `log_retain` setting."""
+        return list(self._data[channel])
+
+    def _put(self, channel, event):
+        if self._closed:
+            return
+        ts = time.time()
+        self._data[channel].append({"ts": ts, **event})
+        try:
+            self._queue.put_nowait((channel, ts, event))
+        except queue.Full:
+            # never block the caller (capture loop); count the loss instead
+            self.dropped += 1
+            perf.count("log.dropped")
+
+    def _writer(self):
+        f = gf = None
+        try:
+            f = _Segment(self.path, "a", **self.rotation)
+            gf = _Segment(self.gaze_path, "ab", header=header_bytes(), record_size=RECORD.size, **self.rotation)
+        except Exception as e:
+            print("Logger open failed:", e)
+            if f:
+                f.close()
+            f = gf = None
+        last_flush = time.monotonic()
+        dirty = False
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if dirty:
+                    self._flush(f, gf)
+                    last_flush, dirty = time.monotonic(), False
+                continue
+            batch = []
+            stop = False
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if item is None:
+                stop = True
+            if f and batch:
+                t0 = time.perf_counter()
+                try:
+                    gf.write(b"".join(pack_gaze(ts, ev) for ch, ts, ev in batch if ch == "gaze"))
+                    f.write("".join(
+                        json.dumps({"ch": ch, "ts": ts, **ev}) + "\n" for ch, ts, ev in batch if ch != "gaze"
+                    ))
+                except Exception:
+                    pass
+                dirty = True
+                perf.record("log.write_batch", time.perf_counter() - t0)
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    self._flush(f, gf)
+                    last_flush, dirty = time.monotonic(), False
+            if stop:
+                break
+        if f:
+            f.close()
+            gf.close()
+
+    @staticmethod
+    def _flush(*segments):
+        for seg in segments:
+            try:
+                seg.flush()
+            except Exception:
+                pass
+
+    def close(self, timeout=2.0):
+        # enqueue the stop sentinel behind any pending events and wait for the flush
+        if self._closed:
+            return
+        self._closed = True
         try:
-            with open(self.path, "w") as f:
-                json.dump(self._data, f, indent=2)
-        except Exception:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
             pass
+        self._thread.join(timeout)
+
     def log_gaze(self, g):
-        self._data["gaze"].append({"ts": time.time(), **g})
-        self._save()
+        with perf.stage("log_gaze"):
+            self._put("gaze", g)
     def log_key(self, k):
-        self._data["keys"].append({"ts": time.time(), **k})
-        self._save()
+        self._put("keys", k)
     def log_voice(self, v):
-        self._data["voice"].append({"ts": time.time(), **v})
-        self._save()
+        self._put("voice", v)
     def log_calibration(self, c):
-        self._data["calibration"].append({"ts": time.time(), **c})
-        self._save()
+        self._put("calibration", c)
@@ -0,0 +1,91 @@
+from .ai.typo_index import TypoIndex, edit_distance
+
+_CODES = {}
+for _letters, _code in (("bfpv", "1"), ("cgjkqsxz", "2"), ("dt", "3"), ("l", "4"), ("mn", "5"), ("r", "6")):
+    for _ch in _letters:
+        _CODES[_ch] = _code
+
+
+def phonetic_key(text):
+    """
+    Soundex-style key of every word, without Soundex's 4-character cut:
+    first letter kept, similar-sounding consonants share a digit, repeats
+    collapse and vowels only separate. "intend" and "indent" share a key.
+    """
+    keys = []
+    for word in text.lower().split():
+        word = "".join(ch for ch in word if ch.isalnum())
+        if not word:
+            continue
+        key = [word[0]]
+        last = _CODES.get(word[0])
+        for ch in word[1:]:
+            code = _CODES.get(ch)
+            if code is None:
+                if ch not in "hw":
+                    last = None  # vowels (and y) separate repeated codes
+                continue
+            if code != last:
+                key.append(code)
+            last = code
+        keys.append("".join(key))
+    return " ".join(keys)
+
+
+def similarity(a, b):
+    """1.0 for equal strings, falling linearly with edit distance."""
+    n = max(len(a), len(b))
+    if not n:
+        return 1.0
+    return 1.0 - edit_distance(a, b, n) / n
+
+
+class PhraseIndex:
+    """
+    Fuzzy lookup of spoken phrases. Each phrase is indexed by its spelling
+    and by its phonetic key, both in symmetric-delete TypoIndexes, so a
+    misheard utterance is compared only with the few phrases near it.
+    match() returns the best phrase with a confidence in [0, 1].
+    The key drops vowels, so unrelated words share it ("data" and "dot"):
+    sound only counts when the spelling is at least `spelling_floor` similar.
+    """
+    def __init__(self, phrases=(), phonetic_weight=0.95, spelling_floor=0.65):
+        self.phonetic_weight = phonetic_weight
+        self.spelling_floor = spelling_floor
+        self._spelled = TypoIndex(max_distance=2, prefix_length=10)
+        self._phonetic = TypoIndex(max_distance=1, prefix_length=10)
+        self._by_key = {}
+        for p in phrases:
+            self.add(p)
+
+    def add(self, phrase):
+        phrase = " ".join(phrase.lower().split())
+        key = phonetic_key(phrase)
+        self._spelled.add(phrase)
+        self._phonetic.add(key)
+        self._by_key.setdefault(key, set()).add(phrase)
+
+    def confidence(self, text, phrase):
+        spelled = similarity(text, phrase)
+        if spelled < self.spelling_floor:
+            return spelled
+        return max(spelled, similarity(phonetic_key(text), phonetic_key(phrase)) * self.phonetic_weight)
+
+    def match(self, text):
+        """Closest phrase to `text` as (phrase, confidence), or None."""
+        text = " ".join(text.lower().split())
+        if not text:
+            return None
+        candidates = set()
+        hit = self._spelled.lookup(text)
+        if hit:
+            candidates.add(hit[0])
+        hit = self._phonetic.lookup(phonetic_key(text))
+        if hit:
+            candidates |= self._by_key[hit[0]]
+        best = None
+        for phrase in candidates:
+            score = self.confidence(text, phrase)
+            if best is None or score > best[1]:
+                best = (phrase, score)
+        return best
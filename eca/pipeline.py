@@ -0,0 +1,50 @@
+import threading
+
+
+class Mailbox:
+    """
+    Single-slot "latest wins" handoff between pipeline stages.
+    put() never blocks: an item that was not taken yet is replaced and
+    counted in `dropped`, so a slow consumer always sees the newest item.
+    `on_drop` is called with every item that is discarded without being
+    taken (replaced, or left behind on reopen), e.g. to release a buffer.
+    """
+    def __init__(self, name, on_drop=None):
+        self.name = name
+        self.on_drop = on_drop
+        self.dropped = 0
+        self.passed = 0
+        self._item = None
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            old, self._item = self._item, item
+            if old is not None:
+                self.dropped += 1
+            self._cond.notify()
+        if old is not None and self.on_drop:
+            self.on_drop(old)
+
+    def get(self, timeout=None):
+        """Take the newest item, or None on timeout / close."""
+        with self._cond:
+            if self._item is None and not self._closed:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            if item is not None:
+                self.passed += 1
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def reopen(self):
+        with self._cond:
+            self._closed = False
+            old, self._item = self._item, None
+        if old is not None and self.on_drop:
+            self.on_drop(old)
@@ -0,0 +1,199 @@
+import abc
+import json
+import threading
+import time
+
+import speech_recognition as sr
+
+# Try to import Vosk; the offline backend needs `pip install vosk` and a model directory
+try:
+    import vosk
+    vosk.SetLogLevel(-1)
+    VOSK_AVAILABLE = True
+except Exception:
+    vosk = None
+    VOSK_AVAILABLE = False
+
+SAMPLE_WIDTH = 2  # 16-bit mono PCM throughout
+
+
+class BufferedSession:
+    """Session for non-streaming backends: collects the audio and recognizes it at the end."""
+    def __init__(self, backend, sample_rate):
+        self._backend = backend
+        self._rate = sample_rate
+        self._chunks = []
+
+    def accept(self, chunk):
+        self._chunks.append(chunk)
+        return False
+
+    def partial(self):
+        return ""
+
+    def result(self):
+        pcm, self._chunks = b"".join(self._chunks), []
+        return self._backend.recognize(pcm, self._rate) if pcm else ""
+
+
+class RecognizerBackend(abc.ABC):
+    """
+    Speech-to-text backend. recognize() turns one utterance of 16-bit mono
+    PCM into text ("" when nothing was understood). Streaming backends also
+    return a session from stream() that is fed audio chunks as they arrive
+    and reports partial hypotheses before the utterance ends. `sample_rate`
+    is the rate the backend needs from the microphone, or None for any.
+    """
+    name = "base"
+    streaming = False
+    sample_rate = None
+
+    @abc.abstractmethod
+    def recognize(self, pcm, sample_rate):
+        """Text of one utterance of 16-bit mono PCM."""
+
+    def stream(self, sample_rate):
+        return BufferedSession(self, sample_rate)
+
+    def set_phrases(self, phrases, mode="command"):
+        """Phrases the user is expected to say; backends that can use them restrict their vocabulary."""
+
+    def close(self):
+        pass
+
+
+class GoogleBackend(RecognizerBackend):
+    """Google Web Speech through speech_recognition; needs network access."""
+    name = "google"
+
+    def __init__(self):
+        self._recognizer = sr.Recognizer()
+
+    def recognize(self, pcm, sample_rate):
+        audio = sr.AudioData(pcm, sample_rate, SAMPLE_WIDTH)
+        try:
+            return self._recognizer.recognize_google(audio)
+        except sr.UnknownValueError:
+            return ""
+
+
+class VoskSession:
+    """Streaming recognition on a Vosk recognizer."""
+    def __init__(self, recognizer):
+        self._rec = recognizer
+        self._rec.Reset()
+        self._texts = []
+
+    def accept(self, chunk):
+        """Feed PCM; True once Vosk's own endpointer considers the utterance finished."""
+        if self._rec.AcceptWaveform(chunk):
+            self._texts.append(json.loads(self._rec.Result()).get("text", ""))
+            return True
+        return False
+
+    def partial(self):
+        return json.loads(self._rec.PartialResult()).get("partial", "")
+
+    def result(self):
+        """Text since the last result(); the session then continues with new audio."""
+        self._texts.append(json.loads(self._rec.FinalResult()).get("text", ""))
+        text = " ".join(t for t in self._texts if t)
+        self._texts = []
+        return text.replace("[unk]", "").strip()
+
+
+class VoskBackend(RecognizerBackend):
+    """
+    Offline Kaldi recognition with Vosk. In "command" mode the recognizer
+    is limited to the words of the command phrases, which is both faster
+    and far more accurate for short commands; "dictation" uses the full
+    model vocabulary.
+    """
+    name = "vosk"
+    streaming = True
+    sample_rate = 16000
+
+    def __init__(self, model_path, mode="command"):
+        if not VOSK_AVAILABLE:
+            raise RuntimeError("vosk is not installed (pip install vosk)")
+        self.model = vosk.Model(model_path)
+        self.mode = mode
+        self._grammar = None
+        self._generation = 0
+        self._local = threading.local()
+
+    def set_phrases(self, phrases, mode=None):
+        self.mode = mode or self.mode
+        words = sorted({w for p in phrases for w in p.lower().split()})
+        self._grammar = json.dumps(words + ["[unk]"]) if words else None
+        self._generation += 1
+
+    def _recognizer(self, sample_rate):
+        # Kaldi recognizers are costly to build and not safe to share between
+        # threads: keep one per thread and rate, rebuilt after set_phrases()
+        local = self._local
+        if getattr(local, "generation", None) != self._generation:
+            local.generation = self._generation
+            local.recognizers = {}
+        rec = local.recognizers.get(sample_rate)
+        if rec is None:
+            if self.mode == "command" and self._grammar:
+                rec = vosk.KaldiRecognizer(self.model, sample_rate, self._grammar)
+            else:
+                rec = vosk.KaldiRecognizer(self.model, sample_rate)
+            local.recognizers[sample_rate] = rec
+        return rec
+
+    def stream(self, sample_rate):
+        return VoskSession(self._recognizer(sample_rate))
+
+    def recognize(self, pcm, sample_rate):
+        session = self.stream(sample_rate)
+        session.accept(pcm)
+        return session.result()
+
+
+class StubBackend(RecognizerBackend):
+    """Local backend for tests and benchmarks: returns scripted texts in order, ignoring the audio."""
+    name = "stub"
+
+    def __init__(self, responses=(), delay=0.0):
+        self.responses = list(responses)
+        self.delay = delay
+        self.phrases = []
+        self._lock = threading.Lock()
+
+    def set_phrases(self, phrases, mode="command"):
+        self.phrases = list(phrases)
+
+    def recognize(self, pcm, sample_rate):
+        with self._lock:
+            text = self.responses.pop(0) if self.responses else ""
+        if self.delay:
+            time.sleep(self.delay)
+        return text
+
+
+def make_backend(settings, phrases=()):
+    """Backend chosen by the voice_backend setting, falling back to Google."""
+    name = (settings.get("voice_backend") or "google").lower()
+    mode = settings.get("voice_mode") or "command"
+    backend = None
+    reason = None
+    try:
+        if name == "vosk":
+            backend = VoskBackend(settings.get("vosk_model_path") or "model", mode)
+        elif name == "stub":
+            backend = StubBackend()
+        elif name != "google":
+            reason = f"unknown voice_backend {name!r}"
+    except Exception as e:
+        reason = f"{name} backend failed to start: {e}"
+    if backend is None:
+        backend = GoogleBackend()
+    backend.set_phrases(phrases, mode)
+    if reason:
+        print("VOICE: Using", backend.name, "recognizer;", reason)
+    else:
+        print("VOICE: Using", backend.name, "recognizer")
+    return backend
@@ -3,9 +3,50 @@ import os
 
 DEFAULTS = {
     "dwell": 900,
+    "snap_tolerance": 12,
+    "dwell_per_key": {},
+    "adaptive_dwell": False,
+    "dwell_min": 450,
     "smoothing": 0.25,
+    "gaze_filter": "one_euro",
+    "one_euro_min_cutoff": 1.0,
+    "one_euro_beta": 1.5,
     "theme": "dark",
-    "confidence": 0.35
+    "pointer_interval_ms": 40,
+    "preview_fps": 25,
+    "confidence": 0.35,
+    "pipeline_log": True,
+    "capture_width": 640,
+    "capture_height": 480,
+    "capture_fps": 30,
+    "adaptive_resolution": False,
+    "roi_tracking": False,
+    "roi_padding": 0.35,
+    "inference_process": False,
+    "haar_scale": 0.5,
+    "haar_interval": 8,
+    "haar_search_margin": 0.5,
+    "haar_min_score": 0.6,
+    "instrumentation": False,
+    "instrumentation_dump": "eca_perf.json",
+    "log_max_bytes": 10 * 1024 * 1024,
+    "log_max_age": 3600,
+    "log_keep_segments": 5,
+    "log_compress": True,
+    "log_retain": {"gaze": 1800, "keys": 500, "voice": 200, "calibration": 10},
+    "grammar_path": None,
+    "command_threshold": 0.8,
+    "command_word_threshold": 0.95,
+    "voice_backend": "google",
+    "vosk_model_path": "model",
+    "voice_mode": "command",
+    "voice_workers": 2,
+    "voice_queue_size": 8,
+    "vad_frame_ms": 30,
+    "vad_threshold": 3.0,
+    "vad_command_end_ms": 250,
+    "vad_dictation_end_ms": 700,
+    "vad_pre_roll_ms": 250
 }
 
 class Settings:
@@ -0,0 +1,136 @@
+import cv2
+import numpy as np
+
+
+class FaceRoi:
+    """
+    Region of interest around the face found in the previous frame.
+    While a face is tracked only the padded crop is passed to the detector;
+    landmarks from the crop are mapped back to full-frame coordinates.
+    After a miss the ROI is cleared and the full frame is searched again.
+    """
+    def __init__(self, padding=0.35, min_size=96):
+        self.padding = padding
+        self.min_size = min_size
+        self.rect = None  # (x0, y0, x1, y1) in pixels
+        self.size = None  # (w, h) of the frame the rect belongs to
+        self.misses = 0
+
+    def update(self, lm, w, h):
+        """Set the ROI from normalized (n, 2) landmarks of a frame of size w x h."""
+        (x0, y0), (x1, y1) = lm.min(axis=0), lm.max(axis=0)
+        pad_x = (x1 - x0) * self.padding
+        pad_y = (y1 - y0) * self.padding
+        x0 = int(max(0, (x0 - pad_x) * w))
+        y0 = int(max(0, (y0 - pad_y) * h))
+        x1 = int(min(w, (x1 + pad_x) * w + 1))
+        y1 = int(min(h, (y1 + pad_y) * h + 1))
+        if x1 - x0 < self.min_size or y1 - y0 < self.min_size:
+            self.rect = None
+        else:
+            self.rect = (x0, y0, x1, y1)
+            self.size = (w, h)
+
+    def reset(self):
+        if self.rect is not None:
+            self.misses += 1
+        self.rect = None
+
+    def crop(self, frame):
+        """Return (image, rect) to run detection on; rect is None for the full frame."""
+        h, w = frame.shape[:2]
+        if self.rect is None or self.size != (w, h):
+            # capture resolution changed under us; search the full frame
+            return frame, None
+        x0, y0, x1, y1 = self.rect
+        return frame[y0:y1, x0:x1], self.rect
+
+    @staticmethod
+    def to_frame(lm, rect, w, h):
+        """Map crop-normalized landmarks (in place) to frame-normalized ones."""
+        if rect is None:
+            return lm
+        x0, y0, x1, y1 = rect
+        lm *= ((x1 - x0) / w, (y1 - y0) / h)
+        lm += (x0 / w, y0 / h)
+        return lm
+
+
+class HaarFaceTracker:
+    """
+    Cheap face locator for when MediaPipe is not installed.
+    The Haar cascade runs on a downscaled grayscale image every `interval`
+    frames; in between, the face box is followed by template matching inside
+    a search window around the last box. A weak match forces a new detection.
+    """
+    def __init__(self, cascade, scale=0.5, interval=8, margin=0.5, min_score=0.6):
+        self.cascade = cascade
+        self.scale = scale
+        self.interval = max(1, int(interval))
+        self.margin = margin
+        self.min_score = min_score
+        self.box = None  # (x, y, w, h) in downscaled pixels
+        self._template = None
+        self._since_detect = 0
+        self._small = None
+        self._gray = None
+
+    @classmethod
+    def from_settings(cls, cascade, settings):
+        return cls(
+            cascade,
+            scale=float(settings.get("haar_scale") or 0.5),
+            interval=int(settings.get("haar_interval") or 8),
+            margin=float(settings.get("haar_search_margin") or 0.5),
+            min_score=float(settings.get("haar_min_score") or 0.6),
+        )
+
+    def locate(self, frame):
+        """Return (cx, cy, conf) of the face centre normalized to the frame, or None."""
+        h, w = frame.shape[:2]
+        size = (max(1, int(w * self.scale)), max(1, int(h * self.scale)))
+        if self._small is None or self._small.shape[:2] != size[::-1]:
+            self._small = np.empty((size[1], size[0], 3), np.uint8)
+            self._gray = np.empty((size[1], size[0]), np.uint8)
+        small = cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        sh, sw = gray.shape[:2]
+        score = None
+        if self.box is not None and self._since_detect < self.interval:
+            score = self._track(gray)
+            if score is None:
+                self.box = None
+        if self.box is None or self._since_detect >= self.interval:
+            if not self._detect(gray):
+                return None
+            score = 1.0
+        self._since_detect += 1
+        x, y, w, h = self.box
+        return (x + w / 2.0) / sw, (y + h / 2.0) / sh, 0.4 * score
+
+    def _detect(self, gray):
+        min_side = max(12, int(48 * self.scale))
+        faces = self.cascade.detectMultiScale(gray, 1.1, 4, minSize=(min_side, min_side))
+        self._since_detect = 0
+        if len(faces) == 0:
+            self.box = self._template = None
+            return False
+        x, y, w, h = (int(v) for v in faces[0])
+        self.box = (x, y, w, h)
+        self._template = gray[y:y + h, x:x + w].copy()
+        return True
+
+    def _track(self, gray):
+        x, y, w, h = self.box
+        mx, my = int(w * self.margin), int(h * self.margin)
+        sx0, sy0 = max(0, x - mx), max(0, y - my)
+        sx1, sy1 = min(gray.shape[1], x + w + mx), min(gray.shape[0], y + h + my)
+        window = gray[sy0:sy1, sx0:sx1]
+        if window.shape[0] < h or window.shape[1] < w:
+            return None
+        res = cv2.matchTemplate(window, self._template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (bx, by) = cv2.minMaxLoc(res)
+        if score < self.min_score:
+            return None
+        self.box = (sx0 + bx, sy0 + by, w, h)
+        return float(score)
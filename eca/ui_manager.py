@@ -2,14 +2,17 @@ import tkinter as tk
 from tkinter.scrolledtext import ScrolledText
 from tkinter import messagebox
 import subprocess, sys, os
+import queue
 
 import cv2
+import numpy as np
 from PIL import Image, ImageTk
 
 from .ai.code_suggester import CodeSuggester
-from .ai.error_checker import ErrorChecker
+from .ai.error_checker import ErrorChecker, ErrorCheckService
 from .virtual_keyboard import VirtualKeyboard
 from .calibration import Calibration
+from .instrument import perf
 
 
 class UIManager:
@@ -22,16 +25,41 @@ class UIManager:
 
         self.code_suggester = CodeSuggester()
         self.error_checker = ErrorChecker()
+        # debounced, incremental checks on a worker thread; results picked up in _tick
+        self.error_service = ErrorCheckService(self.error_checker)
+        # identifiers are harvested once typing pauses, not on every keystroke
+        self._learn_job = None
+        self.learn_delay_ms = 500
 
         # ✅ Voice callback ONLY
-        self.voice.callback = self._on_voice_text
+        # voice results arrive on recognizer threads; _tick applies them on the Tk thread
+        self._voice_texts = queue.SimpleQueue()
+        self._voice_partial = ""
+        self._voice_state = ""
+        self.voice.callback = self._queue_voice_text
+        self.voice.partial_callback = self._on_voice_partial
+        self.voice.activity_callback = self._on_voice_activity
 
         self.root = tk.Tk()
         self.root.title("ECA - Eye & Voice Coding Assistant")
 
+        # gaze pointer and camera preview refresh independently; preview_fps 0 turns the preview off
+        self.tick_ms = int(self.settings.get("pointer_interval_ms") or 40)
+        preview_fps = float(self.settings.get("preview_fps") or 0)
+        self.preview_ms = int(1000 / preview_fps) if preview_fps > 0 else 0
+        self._preview_seq = -1
         self._build_ui()
         self._running = False
 
+        # preview buffers reused every tick: BGR render target, RGBA copy and
+        # a PIL image mapped onto it (PIL only maps 4-byte modes, hence RGBA)
+        self._preview_size = (200, 150)
+        pw, ph = self._preview_size
+        self._preview_bgr = np.empty((ph, pw, 3), np.uint8)
+        self._preview_rgba = np.empty((ph, pw, 4), np.uint8)
+        self._preview_pil = Image.frombuffer("RGBA", self._preview_size, self._preview_rgba, "raw", "RGBA", 0, 1)
+        self._preview_photo = None
+
     # ================= UI =================
     def _build_ui(self):
         # ---------- NAVBAR ----------
@@ -108,7 +136,7 @@ class UIManager:
 
         # ---------- KEYBOARD ----------
         self.keyboard = VirtualKeyboard(
-            self.root, self.settings, self._on_key
+            self.root, self.settings, self._on_key, tick_ms=self.tick_ms
         )
         self.keyboard.place(relx=0.5, rely=0.9, anchor="center")
 
@@ -129,48 +157,89 @@ class UIManager:
         self._running = True
         self.gaze.start()
         self._loop()
+        if self.preview_ms:
+            self._preview_loop()
+        else:
+            self.cam_preview.place_forget()
         self.root.mainloop()
 
     # ================= LOOP =================
     def _loop(self):
+        with perf.stage("ui.loop"):
+            self._tick()
+        self.root.after(self.tick_ms, self._loop)
+
+    def _tick(self):
         with self.gaze.lock:
-            gx, gy = self.gaze.gx, self.gaze.gy
+            gx, gy, ts = self.gaze.gx, self.gaze.gy, self.gaze.ts
             conf, fps = self.gaze.conf, self.gaze.fps
-            frame = self.gaze.frame
+            jitter = self.gaze.frame_jitter
 
         try:
-            self.keyboard._measure_buttons()
-            kx, ky = self.keyboard.winfo_rootx(), self.keyboard.winfo_rooty()
-            kw, kh = self.keyboard.winfo_width(), self.keyboard.winfo_height()
+            with perf.stage("ui.keyboard_geometry"):
+                kx, ky, kw, kh = self.keyboard.geometry()
 
             sx = int(kx + gx * kw)
             sy = int(ky + gy * kh)
 
             if sy < ky - 40:
-                self.keyboard.hover = None
-                self.keyboard.progress = 0
+                self.keyboard.clear_hover(ts)
                 self.kb_dot.place_forget()
             else:
-                self.keyboard.set_hover_by_coords(sx, sy)
+                self.keyboard.feed(sx, sy, ts)
                 rx = sx - self.root.winfo_rootx()
                 ry = sy - self.root.winfo_rooty()
                 self.kb_dot.place(x=rx - 6, y=ry - 6)
         except Exception:
             pass
 
+        errors = self.error_service.poll()
+        if errors is not None:
+            self._show_errors(errors)
+
+        while True:
+            try:
+                voice_text = self._voice_texts.get_nowait()
+            except queue.Empty:
+                break
+            self._on_voice_text(voice_text)
+
+        # per-stage overlay replaces the Conf/FPS status while profiling; voice feedback stays
+        text = perf.overlay_text() if perf.enabled else ""
+        if not text:
+            text = f"Conf: {conf:.2f} | FPS: {fps:.1f} ±{jitter * 1000:.0f}ms"
+        if self._voice_partial:
+            text += f" | Heard: {self._voice_partial}"
+        elif self._voice_state:
+            text += f" | {self._voice_state}"
+        self.status.config(text=text)
+
+    def _preview_loop(self):
+        with perf.stage("ui.preview"):
+            self._update_preview()
+        self.root.after(self.preview_ms, self._preview_loop)
+
+    def _update_preview(self):
+        seq = self.gaze.frame_seq
+        if seq == self._preview_seq:
+            # tracker has not produced a new frame since the last upload
+            perf.count("ui.preview_skipped")
+            return
         try:
-            if frame is not None:
-                frame = cv2.resize(frame, (200, 150))
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                img = ImageTk.PhotoImage(Image.fromarray(frame))
-                self.cam_preview.configure(image=img)
-                self.cam_preview.image = img
+            # annotated at preview size; nothing is drawn at full resolution
+            frame = self.gaze.annotated_frame(self._preview_size, dst=self._preview_bgr)
+            if frame is None:
+                return
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA, dst=self._preview_rgba)
+            if self._preview_photo is None:
+                self._preview_photo = ImageTk.PhotoImage("RGBA", self._preview_size)
+                self.cam_preview.configure(image=self._preview_photo)
+            # _preview_pil shares memory with _preview_rgba; paste updates the Tk image in place
+            self._preview_photo.paste(self._preview_pil)
+            self._preview_seq = seq
         except Exception:
             pass
 
-        self.status.config(text=f"Conf: {conf:.2f} | FPS: {fps:.1f}")
-        self.root.after(40, self._loop)
-
     # ================= AI =================
     def _on_key_release(self, _):
         self._update_suggestions()
@@ -178,14 +247,29 @@ class UIManager:
 
     def _update_suggestions(self):
         self.suggestion_box.delete(0, tk.END)
-        for s in self.code_suggester.suggest(self.editor.get("1.0", "end")):
+        # only the cursor line up to the cursor is needed
+        for s in self.code_suggester.suggest(self.editor.get("insert linestart", "insert")):
             self.suggestion_box.insert(tk.END, s)
 
     def _highlight_errors(self):
+        text = self.editor.get("1.0", "end")
+        cursor_line = int(self.editor.index("insert").split(".")[0]) - 1
+        self.error_service.submit(text, skip_line=cursor_line)
+        if self._learn_job is not None:
+            self.root.after_cancel(self._learn_job)
+        self._learn_job = self.root.after(self.learn_delay_ms, self._learn_names)
+
+    def _learn_names(self):
+        self._learn_job = None
+        text = self.editor.get("1.0", "end")
+        cursor_line = int(self.editor.index("insert").split(".")[0]) - 1
+        self.code_suggester.learn(text, skip_line=cursor_line)
+
+    def _show_errors(self, errors):
     # 🔕 Error detection kept, visual underline removed
         self.error_box.delete(0, tk.END)
 
-        for err in self.error_checker.check_errors(self.editor.get("1.0", "end")):
+        for err in errors:
             self.error_box.insert(tk.END, f"Line {err['line']}: {err['hint']}")
 
     def _apply_suggestion(self):
@@ -197,16 +281,16 @@ class UIManager:
         )
 
         cursor = self.editor.index("insert")
-        line_start = self.editor.index("insert linestart")
-        text_before = self.editor.get(line_start, cursor)
-        parts = text_before.rstrip().split()
+        text_before = self.editor.get("insert linestart", cursor)
+        n, text = self.code_suggester.edit(text_before, suggestion)
 
-        if parts:
-            self.editor.delete(f"{cursor}-{len(parts[-1])}c", cursor)
+        if n:
+            self.editor.delete(f"{cursor}-{n}c", cursor)
 
-        self.editor.insert("insert", suggestion)
+        self.editor.insert("insert", text)
+        self.code_suggester.accept(suggestion)
 
-        if suggestion.strip().endswith(":"):
+        if text.strip().endswith(":"):
             self.editor.insert("insert", "\n    ")
 
         self._update_suggestions()
@@ -239,75 +323,50 @@ class UIManager:
             self.voice.start_listening()
             self.voice_button.config(text="Stop Voice")
 
-    def _on_voice_text(self, text):
-        print("VOICE RECEIVED:", text)
-
-        action, value = self.command_engine.interpret(text)
-
-        print("VOICE ACTION:", action, value)
-    # ---- PAUSE / RESUME ----
-        if action == "pause":
-            self.status.config(text=value)
-            return
-
-        if action == "resume":
-            self.status.config(text=value)
-            return
-    # ---- BLOCK WHEN PAUSED ----
-        if action == "blocked":
-            return
-
-    # ---- COMMAND EXECUTION ----
-        if action == "insert" and value:
-            self.editor.insert("insert", value)
-            return
+    def _queue_voice_text(self, text):
+        self._voice_partial = ""
+        self._voice_state = ""
+        self._voice_texts.put(text)
 
-        if action == "backspace":
-            self.editor.delete("insert-1c")
-            return
+    def _on_voice_partial(self, text):
+        self._voice_partial = text
 
-        if action == "delete_line":
-            self.editor.delete("insert linestart", "insert lineend")
-            return
+    def _on_voice_activity(self, kind):
+        # immediate feedback: shown on the next tick, long before any text arrives
+        self._voice_state = {"start": "Listening…", "end": "Recognizing…"}.get(kind, "")
+        if kind != "start":
+            self._voice_partial = ""
 
-        if action == "clear_line":
-            self.editor.delete("insert linestart", "insert lineend")
-            return
-        if action == "dedent":
-            try:
-                self.editor.delete("insert-4c", "insert")
-            except Exception:
-                pass
-                return
+    def _on_voice_text(self, text):
+        print("VOICE RECEIVED:", text)
 
-        if action == "dictation":
-            self.editor.insert("insert", value + " ")
-            return
+        # one utterance may hold several commands ("colon new line indent")
+        for action, value in self.command_engine.interpret_all(text):
+            print("VOICE ACTION:", action, value)
+            self._apply_action(action, value)
 
+    def _apply_action(self, action, value):
     # ---- PAUSE / RESUME FEEDBACK ----
-        if action == "pause":
+        if action in ("pause", "resume"):
             self.status.config(text=value)
-            return
-
-        if action == "resume":
-            self.status.config(text=value)
-            return
 
     # ---- BLOCK INPUT WHEN PAUSED ----
-        if action == "blocked":
+        elif action == "blocked":
             return
 
+    # ---- RECOGNIZER MODE ----
+        elif action == "mode":
+            self.voice.set_mode(value)
+            self.status.config(text=f"Voice: {value} mode")
+
     # ---- COMMAND EXECUTION ----
-        if action == "insert" and value:
+        elif action == "insert" and value:
             self.editor.insert("insert", value)
 
         elif action == "backspace":
             self.editor.delete("insert-1c")
 
-        elif action == "delete_line":
-            self.editor.delete("insert linestart", "insert lineend")
-
-        elif action == "clear_line":
+        elif action in ("delete_line", "clear_line"):
             self.editor.delete("insert linestart", "insert lineend")
 
         elif action == "dedent":
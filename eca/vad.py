@@ -0,0 +1,152 @@
+import collections
+
+import numpy as np
+
+
+class VoiceActivityDetector:
+    """
+    Energy-based endpointer for 16-bit mono PCM chunks.
+    A chunk is speech when its RMS exceeds the noise floor by `threshold`
+    (by `threshold * release` once an utterance is under way, so soft word
+    endings are kept). The floor is the minimum of the smoothed level of
+    the non-speech chunks in the last `noise_window_s` seconds of them; it
+    is frozen from the start of an utterance until its end, so a long one
+    never raises it. An utterance cut off at `max_utterance_s` means the
+    background itself got louder: the floor is then reset to the quietest
+    level heard during it.
+    An utterance starts after `start_ms` of speech
+    (keeping `pre_roll_ms` of audio before it) and ends after a silence of
+    `command_end_ms` or `dictation_end_ms` depending on `mode`; short
+    commands need no long trailing pause.
+
+    feed() returns ("start", pcm_so_far), ("end", pcm), ("abort", None) for
+    bursts shorter than `min_speech_ms`, or None.
+    """
+    def __init__(self, sample_rate=16000, threshold=3.0, release=0.6, start_ms=60,
+                 min_speech_ms=120, command_end_ms=250, dictation_end_ms=700,
+                 pre_roll_ms=250, max_utterance_s=15.0, mode="command",
+                 noise_window_s=3.0, smoothing=0.5, min_floor=30.0, warmup=5):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.release = release
+        self.start_s = start_ms / 1000.0
+        self.min_speech_s = min_speech_ms / 1000.0
+        self.end_s = {"command": command_end_ms / 1000.0, "dictation": dictation_end_ms / 1000.0}
+        self.pre_roll_s = pre_roll_ms / 1000.0
+        self.max_utterance_s = max_utterance_s
+        self.mode = mode
+        self.noise_window_s = noise_window_s
+        self.smoothing = smoothing
+        self.min_floor = min_floor
+        self.warmup = warmup
+
+        self.noise_floor = None
+        self.level = 0.0
+        self._levels = None  # smoothed level of each non-speech chunk in the noise window
+        self._smooth = None
+        self._quietest = None  # lowest smoothed level of the current utterance
+        self.active = False
+        self._seen = 0
+        self._run = 0.0
+        self._pre = collections.deque()
+        self._pre_s = 0.0
+        self._buf = []
+        self._length = 0.0
+        self._speech = 0.0
+        self._silence = 0.0
+
+    @classmethod
+    def from_settings(cls, settings, sample_rate, mode="command"):
+        return cls(
+            sample_rate=sample_rate,
+            threshold=float(settings.get("vad_threshold") or 3.0),
+            command_end_ms=int(settings.get("vad_command_end_ms") or 250),
+            dictation_end_ms=int(settings.get("vad_dictation_end_ms") or 700),
+            pre_roll_ms=int(settings.get("vad_pre_roll_ms") or 250),
+            mode=mode,
+        )
+
+    @property
+    def end_timeout(self):
+        return self.end_s.get(self.mode, self.end_s["dictation"])
+
+    def _smooth_level(self, rms, dur):
+        if self._levels is None:
+            self._levels = collections.deque(maxlen=max(1, int(round(self.noise_window_s / dur))))
+            self._smooth = rms
+        self._smooth += self.smoothing * (rms - self._smooth)
+
+    def _adapt(self):
+        self._levels.append(self._smooth)
+        self.noise_floor = max(self.min_floor, min(self._levels))
+
+    def feed(self, chunk):
+        x = np.frombuffer(chunk, np.int16).astype(np.float32)
+        if not x.size:
+            return None
+        dur = x.size / self.sample_rate
+        rms = float(np.sqrt(np.dot(x, x) / x.size))
+        self.level = rms
+        self._seen += 1
+
+        floor = self.noise_floor
+        self._smooth_level(rms, dur)
+        if floor is None or self._seen <= self.warmup:
+            # the first chunks only calibrate the floor
+            speech = False
+        else:
+            limit = floor * self.threshold * (self.release if self.active else 1.0)
+            speech = rms > limit
+        if self.active:
+            self._quietest = min(self._quietest, self._smooth)
+        elif not speech:
+            self._adapt()
+
+        if not self.active:
+            self._pre.append(chunk)
+            self._pre_s += dur
+            while len(self._pre) > 1 and self._pre_s - len(self._pre[0]) / 2 / self.sample_rate >= self.pre_roll_s:
+                self._pre_s -= len(self._pre.popleft()) / 2 / self.sample_rate
+            self._run = self._run + dur if speech else 0.0
+            if self._run < self.start_s:
+                return None
+            self.active = True
+            self._quietest = self._smooth
+            self._buf = list(self._pre)
+            self._length = self._pre_s
+            self._speech = self._run
+            self._silence = 0.0
+            return ("start", b"".join(self._buf))
+
+        self._buf.append(chunk)
+        self._length += dur
+        if speech:
+            self._speech += dur
+            self._silence = 0.0
+        else:
+            self._silence += dur
+        if self._silence < self.end_timeout and self._length < self.max_utterance_s:
+            return None
+
+        pcm = b"".join(self._buf)
+        speech_s = self._speech
+        if self._silence < self.end_timeout:
+            # no pause in max_utterance_s: the background got louder, not the user
+            self._levels.clear()
+            self._levels.append(self._quietest)
+            self.noise_floor = max(self.min_floor, self._quietest)
+        self.reset()
+        if speech_s < self.min_speech_s:
+            return ("abort", None)
+        return ("end", pcm)
+
+    def reset(self):
+        """Forget any utterance in progress; the noise floor is kept."""
+        self.active = False
+        self._run = 0.0
+        self._pre.clear()
+        self._pre_s = 0.0
+        self._buf = []
+        self._length = 0.0
+        self._speech = 0.0
+        self._silence = 0.0
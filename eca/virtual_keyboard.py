@@ -1,6 +1,8 @@
 import tkinter as tk
-import time
-import threading
+
+import numpy as np
+
+from .dwell import DwellEngine
 
 # Full US-style keyboard layout (compact, coding-friendly)
 KEY_LAYOUT = [
@@ -33,19 +35,78 @@ KEY_LAYOUT = [
 
 
 
+class KeyGrid:
+    """
+    Uniform-grid spatial index over key rectangles (x0, y0, x1, y1).
+    Each cell lists the keys whose rectangle, grown by `tolerance`, touches
+    it, so a lookup inspects only a handful of candidates regardless of
+    layout size. Points in the padding between keys snap to the nearest key
+    within `tolerance` pixels.
+    """
+    def __init__(self, rects, tolerance=0):
+        self.rects = np.asarray(rects, np.int32).reshape(-1, 4)
+        self.tolerance = int(tolerance)
+        self.cells = {}
+        # plain tuples: per-element numpy access would dominate a lookup
+        self._boxes = [tuple(r) for r in self.rects.tolist()]
+        if not len(self.rects):
+            self.cell = 1
+            return
+        sizes = np.concatenate([self.rects[:, 2] - self.rects[:, 0], self.rects[:, 3] - self.rects[:, 1]])
+        self.cell = max(1, int(np.median(sizes[sizes > 0])) if (sizes > 0).any() else 1)
+        t, c = self.tolerance, self.cell
+        for i, (x0, y0, x1, y1) in enumerate(self._boxes):
+            if x1 <= x0 or y1 <= y0:
+                continue  # not mapped yet
+            for cy in range((y0 - t) // c, (y1 + t) // c + 1):
+                for cx in range((x0 - t) // c, (x1 + t) // c + 1):
+                    self.cells.setdefault((cx, cy), []).append(i)
+
+    def lookup(self, x, y):
+        """Index of the key under (x, y), or of the nearest one within tolerance; else None."""
+        candidates = self.cells.get((int(x) // self.cell, int(y) // self.cell))
+        if not candidates:
+            return None
+        best, best_d = None, None
+        for i in candidates:
+            x0, y0, x1, y1 = self._boxes[i]
+            if x0 <= x < x1 and y0 <= y < y1:
+                return i
+            dx = max(x0 - x, 0, x - x1 + 1)
+            dy = max(y0 - y, 0, y - y1 + 1)
+            d = dx * dx + dy * dy
+            if best_d is None or d < best_d:
+                best, best_d = i, d
+        if best_d is not None and best_d <= self.tolerance * self.tolerance:
+            return best
+        return None
+
+
 class VirtualKeyboard(tk.Frame):
-    def __init__(self, parent, settings, on_key, dwell_ms=None):
+    """
+    Gaze-driven keyboard. The UI thread feeds gaze samples through feed();
+    dwell time is integrated from the sample timestamps by a DwellEngine and
+    selections call on_key on the UI thread.
+    """
+    def __init__(self, parent, settings, on_key, dwell_ms=None, tick_ms=40):
         super().__init__(parent)
         self.settings = settings
         self.on_key = on_key
-        self.dwell = int(dwell_ms if dwell_ms is not None else int(self.settings.get("dwell") or 900))
+        self.engine = DwellEngine.from_settings(self.settings, dwell_ms)
+        self.tick_ms = tick_ms
+        self._deadline = None
         self.buttons = []
+        # key rectangles (x0, y0, x1, y1) relative to the keyboard, plus the
+        # keyboard's screen origin and size; re-measured only after layout events
+        self._rects = np.zeros((0, 4), np.int32)
+        self._origin = (0, 0)
+        self._size = (0, 0)
+        self._geometry_dirty = True
+        self.snap_tolerance = int(self.settings.get("snap_tolerance") or 0)
+        self._grid = KeyGrid(self._rects)
         self.hover = None
         self.progress = 0.0
-        self._running = True
         self._create_keys()
-        self._thread = threading.Thread(target=self._update_loop, daemon=True)
-        self._thread.start()
 
     def _create_keys(self):
         for r, row in enumerate(KEY_LAYOUT):
@@ -73,9 +134,35 @@ class VirtualKeyboard(tk.Frame):
 
         self.update_idletasks()
         self._measure_buttons()
+        # geometry changes only on (re)layout, mapping, window moves or DPI changes,
+        # all of which deliver <Configure> / <Map> to the keyboard or its toplevel
+        self.bind("<Configure>", self.invalidate_geometry, add="+")
+        self.bind("<Map>", self.invalidate_geometry, add="+")
+        self.winfo_toplevel().bind("<Configure>", self.invalidate_geometry, add="+")
+
+    def invalidate_geometry(self, event=None):
+        # the toplevel binding also sees <Configure> of every descendant (the
+        # gaze dot moves and the status label resizes every tick); only the
+        # window itself or the keyboard frame moving changes key positions
+        if event is not None and event.widget not in (self, self.winfo_toplevel()):
+            return
+        self._geometry_dirty = True
+
+    def geometry(self):
+        """Screen (x, y, w, h) of the keyboard, from the cached measurement."""
+        if self._geometry_dirty:
+            self._measure_buttons()
+        return self._origin + self._size
 
     def _measure_buttons(self):
-        for item in self.buttons:
+        try:
+            ox, oy = self.winfo_rootx(), self.winfo_rooty()
+            self._origin = (ox, oy)
+            self._size = (self.winfo_width(), self.winfo_height())
+        except Exception:
+            return
+        rects = np.zeros((len(self.buttons), 4), np.int32)
+        for i, item in enumerate(self.buttons):
             w = item["widget"]
             try:
                 item.update({
@@ -86,14 +173,16 @@ class VirtualKeyboard(tk.Frame):
                 })
             except Exception:
                 pass
+            rects[i] = (item["x"] - ox, item["y"] - oy, item["x"] - ox + item["w"], item["y"] - oy + item["h"])
+        self._rects = rects
+        self._grid = KeyGrid(rects, self.snap_tolerance)
+        self._geometry_dirty = False
 
     def set_hover_by_coords(self, sx, sy):
-        hit = None
-        for item in self.buttons:
-            x, y, w, h = item["x"], item["y"], item["w"], item["h"]
-            if x <= sx <= x + w and y <= sy <= y + h:
-                hit = item
-                break
+        if self._geometry_dirty:
+            self._measure_buttons()
+        idx = self._grid.lookup(sx - self._origin[0], sy - self._origin[1])
+        hit = self.buttons[idx] if idx is not None else None
 
         if hit is not self.hover:
             if self.hover:
@@ -103,7 +192,6 @@ class VirtualKeyboard(tk.Frame):
                     pass
 
             self.hover = hit
-            self.progress = 0.0
 
             if self.hover:
                 try:
@@ -111,21 +199,52 @@ class VirtualKeyboard(tk.Frame):
                 except Exception:
                     pass
 
-    def _update_loop(self):
-        while self._running:
-            if self.hover:
-                step = 50
-                self.progress += step / max(1, self.dwell)
-                if self.progress >= 1.0:
-                    key = self.hover["key"]
-                    try:
-                        self.on_key(key)
-                    except Exception:
-                        pass
-                    self.progress = 0.0
-            else:
-                self.progress = 0.0
-            time.sleep(0.05)
+    # ================= DWELL =================
+    def feed(self, sx, sy, ts):
+        """Gaze sample at screen (sx, sy) captured at time `ts`; UI thread only."""
+        self.set_hover_by_coords(sx, sy)
+        self._advance(ts)
+
+    def clear_hover(self, ts):
+        """Gaze left the keyboard."""
+        if self.hover:
+            try:
+                self.hover["widget"].config(relief="raised")
+            except Exception:
+                pass
+        self.hover = None
+        self._advance(ts)
+
+    def _advance(self, ts):
+        key = self.engine.update(self.hover, self.hover["key"] if self.hover else None, ts)
+        self.progress = self.engine.progress
+        self._cancel_deadline()
+        if key is not None:
+            self._select(key)
+            return
+        # finish inside a tick instead of waiting for the next sample batch
+        remaining = self.engine.remaining()
+        if remaining is not None and remaining * 1000 < self.tick_ms:
+            target = self.hover
+            self._deadline = self.after(int(remaining * 1000), lambda: self._on_deadline(target))
+
+    def _on_deadline(self, target):
+        self._deadline = None
+        if target is not None and target is self.hover and self.engine.target is target:
+            self._select(self.engine.complete())
+
+    def _cancel_deadline(self):
+        if self._deadline is not None:
+            self.after_cancel(self._deadline)
+            self._deadline = None
+
+    def _select(self, key):
+        self.progress = 0.0
+        try:
+            self.on_key(key)
+        except Exception:
+            pass
 
     def stop(self):
-        self._running = False
\ No newline at end of file
+        self._cancel_deadline()
+        self.engine.reset()
\ No newline at end of file
@@ -1,53 +1,190 @@
+import queue
 import threading
 import speech_recognition as sr
 
+from .instrument import perf
+from .recognizers import make_backend
+from .vad import VoiceActivityDetector
+
 class VoiceEngine:
-    def __init__(self, settings, logger, callback=None):
+    """
+    Listens on the microphone and hands recognized text to `callback`.
+    Recognition goes through a RecognizerBackend (voice_backend setting).
+
+    A capture thread reads raw microphone chunks and runs them through a
+    VoiceActivityDetector, reporting "start", "end" and "abort" to
+    `activity_callback` as utterances begin and finish. Each finished
+    utterance goes into a bounded queue (the oldest is dropped when full)
+    and capture carries on at once. A pool of recognition workers drains
+    the queue concurrently and results reach `callback` in utterance order.
+    Streaming backends instead take the chunks while the user speaks and
+    report partial hypotheses to `partial_callback`. All callbacks run on
+    voice threads.
+    """
+    def __init__(self, settings, logger, callback=None, phrases=(), backend=None):
         self.callback = callback
+        self.partial_callback = None
+        self.activity_callback = None
         self.logger = logger
+        self.phrases = list(phrases)
+        self.mode = settings.get("voice_mode") or "command"
+        self.backend = backend or make_backend(settings, self.phrases)
 
-        self.recognizer = sr.Recognizer()
-        self.recognizer.energy_threshold = 300
-        self.recognizer.dynamic_energy_threshold = True
+        self.num_workers = max(1, int(settings.get("voice_workers") or 2))
+        self._utterances = queue.Queue(maxsize=max(1, int(settings.get("voice_queue_size") or 8)))
+        self._workers = []
+        self._seq = 0
+        self._next_seq = 0
+        self._results = {}
+        self._order_lock = threading.Lock()
+
+        # only backends that need a given rate (Vosk) force it; others take the device's own
+        rate = self.backend.sample_rate
+        frame_ms = int(settings.get("vad_frame_ms") or 30)
 
         try:
             # 🔥 FORCE MIC INDEX = 1
-            self.microphone = sr.Microphone(device_index=1)
+            if rate:
+                self.microphone = sr.Microphone(device_index=1, sample_rate=rate)
+            else:
+                self.microphone = sr.Microphone(device_index=1)
+                rate = self.microphone.SAMPLE_RATE
+            # small chunks keep endpointing and start feedback responsive; read when the stream opens
+            self.microphone.CHUNK = max(1, int(rate * frame_ms / 1000))
             print("VOICE: Microphone ready (index 1)")
         except Exception as e:
             print("VOICE: Microphone error:", e)
             self.microphone = None
+        self.vad = VoiceActivityDetector.from_settings(settings, rate or 16000, self.mode)
 
         self.running = False
 
+    def set_mode(self, mode):
+        """Switch between "command" (restricted vocabulary) and "dictation"."""
+        self.mode = mode
+        self.vad.mode = mode
+        self.backend.set_phrases(self.phrases, mode)
+        print("VOICE: Mode", mode)
+
     def start_listening(self):
         if self.running or not self.microphone:
             print("VOICE: Cannot start")
             return
 
         self.running = True
-        threading.Thread(target=self._listen_loop, daemon=True).start()
+        self.vad.reset()
+        if not self.backend.streaming:
+            self._start_workers()
+        threading.Thread(target=self._capture_loop, daemon=True).start()
         print("VOICE: Started listening")
 
     def stop_listening(self):
         self.running = False
         print("VOICE: Stopped")
 
-    def _listen_loop(self):
-        with self.microphone as source:
-            self.recognizer.adjust_for_ambient_noise(source, duration=1)
+    def _start_workers(self):
+        # workers outlive stop_listening() so queued utterances still get recognized
+        while len(self._workers) < self.num_workers:
+            t = threading.Thread(target=self._recognize_worker, daemon=True)
+            t.start()
+            self._workers.append(t)
+
+    def _deliver(self, text):
+        print("VOICE HEARD:", text)
+        if text and self.callback:
+            self.callback(text)
+
+    def _activity(self, kind):
+        if self.activity_callback:
+            self.activity_callback(kind)
 
+    def _capture_loop(self):
+        # the microphone is read continuously; the VAD decides where utterances start and end
+        with self.microphone as source:
+            rate = source.SAMPLE_RATE
+            session = None
+            mode = None
+            last_partial = ""
+            print("VOICE: Speak...")
             while self.running:
                 try:
-                    print("VOICE: Speak...")
-                    audio = self.recognizer.listen(source)
-                    text = self.recognizer.recognize_google(audio)
-                    print("VOICE HEARD:", text)
+                    chunk = source.stream.read(source.CHUNK)
+                    with perf.stage("voice.vad"):
+                        event = self.vad.feed(chunk)
+                    kind = event[0] if event else None
+                    if kind:
+                        self._activity(kind)
 
-                    if self.callback:
-                        self.callback(text)
+                    if not self.backend.streaming:
+                        if kind == "end":
+                            self.submit(event[1], rate)
+                        continue
 
-                except sr.UnknownValueError:
-                    print("VOICE: Could not understand")
+                    # streaming: recognize while the user speaks, finish at the VAD endpoint
+                    if kind == "start":
+                        if session is None or mode != self.mode:
+                            # set_mode() rebuilt the backend's recognizer
+                            mode = self.mode
+                            session = self.backend.stream(rate)
+                        session.accept(event[1])  # includes the pre-roll
+                    elif self.vad.active or kind in ("end", "abort"):
+                        with perf.stage("voice.stream"):
+                            session.accept(chunk)
+                    else:
+                        continue
+
+                    if kind in ("end", "abort"):
+                        with perf.stage("voice.recognize"):
+                            text = session.result()
+                        last_partial = ""
+                        if kind == "end" and text:
+                            self._deliver(text)
+                    elif self.partial_callback:
+                        partial = session.partial()
+                        if partial != last_partial:
+                            last_partial = partial
+                            self.partial_callback(partial)
                 except Exception as e:
-                    print("VOICE ERROR:", e)
\ No newline at end of file
+                    print("VOICE ERROR:", e)
+
+    def submit(self, pcm, sample_rate):
+        """Queue one utterance of 16-bit mono PCM for recognition; capture thread only."""
+        item = (self._seq, pcm, sample_rate)
+        self._seq += 1
+        while True:
+            try:
+                self._utterances.put_nowait(item)
+                return
+            except queue.Full:
+                pass
+            try:
+                seq = self._utterances.get_nowait()[0]
+            except queue.Empty:
+                continue
+            # recognition has fallen behind: give up on the oldest utterance
+            perf.count("voice.dropped")
+            print("VOICE: Dropped utterance", seq)
+            self._complete(seq, None)
+
+    def _recognize_worker(self):
+        while True:
+            seq, pcm, rate = self._utterances.get()
+            text = None
+            try:
+                with perf.stage("voice.recognize"):
+                    text = self.backend.recognize(pcm, rate)
+                if not text:
+                    print("VOICE: Could not understand")
+            except Exception as e:
+                print("VOICE ERROR:", e)
+            self._complete(seq, text)
+
+    def _complete(self, seq, text):
+        # hold results back until every earlier utterance is done (or dropped)
+        with self._order_lock:
+            self._results[seq] = text
+            while self._next_seq in self._results:
+                text = self._results.pop(self._next_seq)
+                self._next_seq += 1
+                if text:
+                    self._deliver(text)